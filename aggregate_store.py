@@ -0,0 +1,124 @@
+"""Incremental aggregation store for survey batches.
+
+Keeps running (question, year, category) counts on disk together with the
+counts contributed by each ingested batch file. A new field upload is counted
+on its own and merged into the totals, and only the tables whose questions it
+touches are rebuilt, so an update costs time proportional to the batch rather
+than to the full response history. A changed or deleted batch file has its
+previous contribution subtracted again.
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+
+from survey_loader import SurveyCounts, count_survey, index_names, survey_files, table_names
+
+MANIFEST = "aggregates.json"
+# Bump when the counts layout changes; older manifests are recounted from the batch files
+FORMAT = 2
+
+
+def batch_id(filename):
+    stat = os.stat(filename)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def counts_to_json(counts):
+    return {
+        column: [[*(str(key) for key in keys), int(count)] for keys, count in series.items()]
+        for column, series in counts.counts.items()
+    }
+
+
+def counts_from_json(data):
+    counts = SurveyCounts()
+    for column, rows in data.items():
+        index = pd.MultiIndex.from_tuples([tuple(row[:-1]) for row in rows], names=index_names(column))
+        counts.counts[column] = pd.Series([row[-1] for row in rows], index=index, dtype="int64")
+    return counts
+
+
+class AggregateStore:
+    def __init__(self, directory, memory_budget=256 * 2**20):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.totals = SurveyCounts()
+        self.batches = {}
+        self._tables = {}
+        self._stale = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def merge_batch(self, filename):
+        """Merge one batch file; returns the dataset names whose tables changed."""
+        name = os.path.basename(filename)
+        version = batch_id(filename)
+        with self._lock:
+            previous = self.batches.get(name)
+            if previous and previous["id"] == version:
+                return set()
+        counts = count_survey(filename, self.memory_budget)
+        with self._lock:
+            touched = self.totals.merge(counts)
+            if previous:
+                touched |= self.totals.merge(counts_from_json(previous["counts"]), sign=-1)
+            self.batches[name] = {"id": version, "counts": counts_to_json(counts)}
+            self._invalidate(touched)
+        return table_names(touched)
+
+    def remove_batch(self, name):
+        with self._lock:
+            previous = self.batches.pop(name, None)
+            if previous is None:
+                return set()
+            touched = self.totals.merge(counts_from_json(previous["counts"]), sign=-1)
+            self._invalidate(touched)
+        return table_names(touched)
+
+    def sync(self, path):
+        """Bring the store in line with the batch files currently under `path`."""
+        changed = set()
+        present = set()
+        for filename in survey_files(path):
+            present.add(os.path.basename(filename))
+            changed |= self.merge_batch(filename)
+        for name in set(self.batches) - present:
+            changed |= self.remove_batch(name)
+        if changed:
+            self.save()
+        return changed
+
+    def tables(self):
+        with self._lock:
+            if self._stale is None or self._stale:
+                names = self._stale
+                self._tables.update(self.totals.tables(names))
+                self._stale = set()
+            return dict(self._tables)
+
+    def save(self):
+        with self._lock:
+            data = {"format": FORMAT, "batches": self.batches, "totals": counts_to_json(self.totals)}
+        path = os.path.join(self.directory, MANIFEST)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _invalidate(self, columns):
+        if self._stale is not None:
+            self._stale |= table_names(columns)
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                data = json.load(f)
+        except OSError:
+            return
+        if data.get("format") != FORMAT:
+            return
+        self.batches = data["batches"]
+        self.totals = counts_from_json(data["totals"])
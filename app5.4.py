@@ -1,416 +1,350 @@
+import os
+import sys
+
 import dash
 from dash import html, dcc
-from dash.dependencies import Input, Output
-import plotly.express as px
-import pandas as pd
-
-app = dash.Dash(__name__)
-
-# Create all datasets
-data_gender_age = pd.DataFrame({
-    "Category": ["Female", "Male", "Age 46-60", "Age 30-45", "Other"],
-    "Percentage": [50, 40, 60, 30, 10]
-})
-
-data_water_availability = pd.DataFrame({
-    "Year": ["2021", "2021", "2024", "2024"],
-    "Category": ["Shortages", "Improved", "Shortages", "Improved"],
-    "Respondents": [55, 20, 15, 60]
-})
-
-data_agri_water = pd.DataFrame({
-    "Year": ["2021", "2024"],
-    "Shortages": [80, 20],
-    "Improved": [20, 80]
-})
-
-data_irrigation = pd.DataFrame({
-    "Practice": ["Improved", "No Change", "Others"],
-    "Percentage": [60, 25, 15]
-})
-
-data_crop_types = pd.DataFrame({
-    "Year": ["2021", "2024", "2021", "2024"],
-    "Crop": ["Mixed Cropping", "Mixed Cropping", "Cotton", "Cotton"],
-    "Percentage": [45, 55, 55, 45]
-})
-
-data_yield_changes = pd.DataFrame({
-    "Category": ["10-20%", "20-30%", ">30%"],
-    "Percentage": [40, 35, 25]
-})
-
-data_income = pd.DataFrame({
-    "Year": ["2021", "2024"],
-    "Low": [70, 40],
-    "Moderate": [20, 40],
-    "Significant": [10, 20]
-})
-
-data_economic = pd.DataFrame({
-    "Activity": ["New Businesses", "No Change", "Fewer Jobs", "Same Jobs", "More Jobs"],
-    "Percentage": [40, 60, 10, 30, 60]
-})
-
-data_wellbeing = pd.DataFrame({
-    "Year": ["2021", "2024"],
-    "Poor": [50, 15],
-    "Better": [30, 55],
-    "Much Better": [20, 30]
-})
-
-data_community = pd.DataFrame({
-    "Improvement": ["Access to Water", "Crop Productivity", "Others"],
-    "Percentage": [55, 35, 10]
-})
-
-data_benefits = pd.DataFrame({
-    "Category": ["Increased Productivity", "Others"],
-    "Percentage": [75, 25]
-})
-
-data_suggestions = pd.DataFrame({
-    "Suggestion": ["Storage of Water", "Maintain Lake", "Others", "New Initiatives"],
-    "Frequency": [40, 30, 20, 10]
-})
-"""
-# Create figures with consistent height
-chart_height = 300
-
-figures = {
-    'demographics': px.pie(data_gender_age, names='Category', values='Percentage',
-                         title="Demographics Overview", height=chart_height,
-                         color_discrete_sequence=px.colors.sequential.RdBu),
-    
-    'water_availability': px.bar(data_water_availability, x="Category", y="Respondents",
-                               color="Year", barmode="group", title="Water Availability Changes",
-                               height=chart_height, color_discrete_sequence=px.colors.qualitative.Set1),
-    
-    'agri_water': px.line(data_agri_water.melt(id_vars="Year", var_name="Condition",
-                         value_name="Percentage"), x="Year", y="Percentage",
-                         color="Condition", title="Agricultural Water Availability",
-                         height=chart_height, color_discrete_sequence=px.colors.qualitative.Dark2),
-    
-    'irrigation': px.bar(data_irrigation, x="Practice", y="Percentage",
-                       title="Change in Irrigation Practices", height=chart_height,
-                       color_discrete_sequence=px.colors.sequential.Viridis),
-    
-    'crop_types': px.bar(data_crop_types, x="Crop", y="Percentage",
-                        color="Year", barmode="group", title="Crop Types (2021 vs. 2024)",
-                        height=chart_height, color_discrete_sequence=px.colors.qualitative.Plotly),
-    
-    'yield_changes': px.bar(data_yield_changes, x="Category", y="Percentage",
-                           orientation="h", title="Yield Changes", height=chart_height,
-                           color_discrete_sequence=px.colors.sequential.Blues),
-    
-    'income': px.area(data_income.melt(id_vars="Year", var_name="Income Level",
-                     value_name="Percentage"), x="Year", y="Percentage",
-                     color="Income Level", title="Income Changes Over Time",
-                     height=chart_height, color_discrete_sequence=px.colors.sequential.Sunset),
-    
-    'economic': px.pie(data_economic.iloc[:2], names="Activity",
-                      values="Percentage", title="Economic Activities",
-                      height=chart_height, color_discrete_sequence=px.colors.sequential.Emrld),
-    
-    'employment': px.bar(data_economic.iloc[2:], x="Activity", y="Percentage",
-                       title="Employment Opportunities", height=chart_height,
-                       color_discrete_sequence=px.colors.qualitative.Set3),
-    
-    'wellbeing': px.bar(data_wellbeing.melt(id_vars="Year", var_name="Rating",
-                       value_name="Percentage"), x="Year", y="Percentage",
-                       color="Rating", barmode="group", title="Well-being Ratings",
-                       height=chart_height, color_discrete_sequence=px.colors.qualitative.T10),
-    
-    'community': px.bar(data_community, x="Improvement", y="Percentage",
-                      orientation="h", title="Community Benefits",
-                      height=chart_height, color_discrete_sequence=px.colors.sequential.Mint),
-    
-    'benefits': px.pie(data_benefits, names="Category", values="Percentage",
-                      title="Significant Benefits", height=chart_height,
-                      color_discrete_sequence=px.colors.qualitative.Bold),
-    
-    'suggestions': px.bar(data_suggestions, x="Suggestion", y="Frequency",
-                        title="Suggestions Distribution", height=chart_height,
-                        color_discrete_sequence=px.colors.qualitative.Safe)
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from asset_pipeline import dash_assets, install_bundles
+from coalesce import install_coalescing
+from compression import install_compression
+from cube import DIMENSIONS, configured as crosstab_available, crosstab_figure, load_cube, question_titles
+from figure_cache import FigureCache
+from figure_registry import FigureRegistry
+from filters import (FILTERS, cached_figure, figure_job_params, filter_options, filtered_figure, normalize_filters,
+                     remember_figure, survey_store)
+from jobs import job_queue
+from metrics import instrument
+from profiling import install_profiler
+from payload import hoist_template, print_switching_report
+from snapshot import PerSnapshot, install_hot_reload, snapshot_cache
+
+app = instrument(dash.Dash(__name__, **dash_assets()))
+install_profiler(app.server)
+install_compression(app.server)
+install_bundles(app.server)
+install_coalescing(app.server)
+
+# Figures are declared in figure_registry and built on first use, once per data snapshot.
+# Every figure is serialized once and kept in memory by content; with the shared cache
+# enabled (ALKOD_SHARED_CACHE) other workers and restarts read it back (see figure_cache.py)
+figure_cache = PerSnapshot(lambda datasets: FigureCache.from_registry(FigureRegistry(datasets)))
+
+# Figure shown for each sidebar button
+button_figures = {
+    'demograph-btn': 'demographics',
+    'household-water-btn': 'water_availability',
+    'agriculture-water-btn': 'agri_water',
+    'yield-btn': 'yield_changes',
+    'crops-btn': 'crop_types',
+    'economic-growth-btn': 'economic',
+    'livestock-btn': 'employment',
+    'well-being-btn': 'wellbeing',
+    'suggestions-btn': 'suggestions',
 }
 
-"""
-# Set common chart styling parameters
-chart_height = 300
-border_color = "rgba(0,0,0,0.1)"
-bg_color = "white"
-text_color = "rgba(0,0,0,0.7)"
-
-# Update each chart with new styling
-figures = {
-    'demographics': px.pie(data_gender_age, names='Category', values='Percentage',
-                         title="Demographics Overview", height=chart_height,
-                         color_discrete_sequence=px.colors.sequential.RdBu)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        margin=dict(l=20, r=20, t=40, b=20),
-        showlegend=True,
-        legend_title=dict(text="Categories", font=dict(size=12, color=text_color)),
-        margin_pad=10,
-        font=dict(size=14, color=text_color)
-    )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'water_availability': px.bar(data_water_availability, x="Category", y="Respondents",
-                               color="Year", barmode="group", title="Water Availability Changes",
-                               height=chart_height, color_discrete_sequence=px.colors.qualitative.Set1)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Category",
-        yaxis_title="Respondents",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
-    )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'agri_water': px.line(data_agri_water.melt(id_vars="Year", var_name="Condition", value_name="Percentage"),
-                         x="Year", y="Percentage", color="Condition", title="Agricultural Water Availability",
-                         height=chart_height, color_discrete_sequence=px.colors.qualitative.Dark2)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Year",
-        yaxis_title="Percentage",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
-    )
-    .update_traces(line=dict(width=2, color=border_color)),
-
-    'irrigation': px.bar(data_irrigation, x="Practice", y="Percentage",
-                       title="Change in Irrigation Practices", height=chart_height,
-                       color_discrete_sequence=px.colors.sequential.Viridis)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Practice",
-        yaxis_title="Percentage",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
-    )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'crop_types': px.bar(data_crop_types, x="Crop", y="Percentage", color="Year", barmode="group",
-                        title="Crop Types (2021 vs. 2024)", height=chart_height, 
-                        color_discrete_sequence=px.colors.qualitative.Plotly)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Crop",
-        yaxis_title="Percentage",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
-    )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'yield_changes': px.bar(data_yield_changes, x="Category", y="Percentage", orientation="h",
-                           title="Yield Changes", height=chart_height, 
-                           color_discrete_sequence=px.colors.sequential.Blues)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Percentage",
-        yaxis_title="Category",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
-    )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'income': px.area(data_income.melt(id_vars="Year", var_name="Income Level", value_name="Percentage"),
-                     x="Year", y="Percentage", color="Income Level", title="Income Changes Over Time",
-                     height=chart_height, color_discrete_sequence=px.colors.sequential.Sunset)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Year",
-        yaxis_title="Percentage",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
-    )
-    .update_traces(line=dict(width=2, color=border_color)),
-
-    'economic': px.pie(data_economic.iloc[:2], names="Activity", values="Percentage", 
-                       title="Economic Activities", height=chart_height, 
-                       color_discrete_sequence=px.colors.sequential.Emrld)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        margin=dict(l=20, r=20, t=40, b=20),
-        showlegend=True,
-        legend_title=dict(text="Economic Activities", font=dict(size=12, color=text_color)),
-        font=dict(size=14, color=text_color)
+# "client" ships every figure once in a dcc.Store and switches sections in the browser;
+# "server" (default) fetches the figure from update_content on every click
+section_switching = os.environ.get("SECTION_SWITCHING", "server")
+
+# Filtered aggregations over a survey store can take seconds: they run as
+# background jobs (jobs.py) unless ALKOD_BACKGROUND_JOBS=0
+background_jobs = os.environ.get("ALKOD_BACKGROUND_JOBS", "auto")
+background_jobs = background_jobs == "1" or (background_jobs == "auto" and survey_store() is not None)
+
+welcome = html.Div(["Welcome to the Dashboard!"])
+
+
+# Filter dropdowns; columns without options (no survey store configured) stay disabled
+def filter_controls():
+    filter_values = filter_options()
+    return html.Div([
+        html.Div([
+            html.Label(label, htmlFor=f"filter-{column}"),
+            dcc.Dropdown(id=f"filter-{column}", options=filter_values[column], multi=True, placeholder="All",
+                         disabled=not filter_values[column], style={'color': 'black'}),
+        ], style={'margin-bottom': '10px'})
+        for column, label in FILTERS.items()
+    ])
+
+
+def current_figure(name, filters):
+    if normalize_filters(filters):
+        return filtered_figure(name, filters)
+    return figure_cache.get(name)
+
+
+def figure_store_data(filters, figures=None):
+    if figures is None:
+        figures = {name: current_figure(name, filters) for name in set(button_figures.values())}
+    # Every figure shares the template, so the store carries it once
+    template, store_figures = hoist_template(figures)
+    return {'buttons': button_figures, 'template': template, 'figures': store_figures}
+
+
+def content_children():
+    if section_switching != "client":
+        return None
+    return [
+        html.Div(welcome, id="welcome"),
+        dcc.Graph(id="content-graph", style={'display': 'none'}),
+        dcc.Store(id="figure-store", data=figure_store_data({})),
+    ]
+
+# Any question broken down by any filter dimension, answered from the survey cube (cube.py)
+if crosstab_available():
+    crosstab_panel = html.Div([
+        html.H3("Cross-tab"),
+        html.Div([
+            dcc.Dropdown(id="crosstab-question", clearable=False, style={'flex': '2'},
+                         options=[{'label': title, 'value': question} for question, title in question_titles().items()],
+                         value=next(iter(question_titles()))),
+            dcc.Dropdown(id="crosstab-by", clearable=False, style={'flex': '1'},
+                         options=[{'label': FILTERS[dim], 'value': dim} for dim in DIMENSIONS], value=DIMENSIONS[-1]),
+        ], style={'display': 'flex', 'gap': '10px'}),
+        dcc.Graph(id="crosstab-graph"),
+    ], style={'margin-top': '20px'})
+else:
+    crosstab_panel = None
+
+# The cube of the request's data snapshot, built before new data is swapped in
+current_cube = snapshot_cache(load_cube)
+
+
+# Define the layout of the app; the filter options and client-side figures depend on the data
+@snapshot_cache
+def serve_layout():
+    return html.Div([
+        dcc.Store(id="active-section"),
+        dcc.Store(id="pending-job"),
+        dcc.Interval(id="job-poll", interval=500, disabled=True),
+        html.Div([
+            html.Div([
+                html.H2("Dashboard", style={'color': 'white', 'text-align': 'center'}),
+                html.Hr(style={'border': '1px solid #ccc'}),
+                filter_controls(),
+                html.Div(id="job-status", style={'min-height': '1.5em', 'font-size': '0.9em'}),
+                html.Hr(style={'border': '1px solid #ccc'}),
+                html.Div([
+                    html.Button("Demograph", id="demograph-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Household Water Improvement", id="household-water-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Agriculture and Irrigation Water Improvement", id="agriculture-water-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Yield from Agriculture", id="yield-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Crops", id="crops-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Economic Growth", id="economic-growth-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Livestock", id="livestock-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Well-being and Community Benefits", id="well-being-btn", n_clicks=0, className="sidebar-button"),
+                    html.Button("Suggestions", id="suggestions-btn", n_clicks=0, className="sidebar-button"),
+                ], style={'display': 'flex', 'flexDirection': 'column'}),
+            ], id="sidebar", style={
+                'width': '20%', 'height': '100%', 'position': 'fixed', 'top': '0', 'left': '0',
+                'background-color': '#2c3e50', 'padding': '20px', 'color': 'white', 'overflow-y': 'auto'
+            }),
+
+            # Main Content Area
+            html.Div([
+                html.Div(content_children(), id="content"),
+                crosstab_panel,
+            ], style={'margin-left': '20%', 'padding': '20px', 'background-color': '#ecf0f1'}),
+        ], style={'display': 'flex'}),
+    ])
+
+
+app.layout = serve_layout
+
+
+def warm():
+    """Build everything a first page view would, for the current data snapshot."""
+    figure_cache.warm()
+    serve_layout()
+    if crosstab_panel is not None:
+        current_cube()
+
+
+install_hot_reload(app.server, warm)
+
+button_inputs = [Input(button_id, 'n_clicks') for button_id in button_figures]
+filter_inputs = [Input(f"filter-{column}", 'value') for column in FILTERS]
+
+if crosstab_panel is not None:
+    @app.callback(
+        Output('crosstab-graph', 'figure'),
+        Input('crosstab-question', 'value'),
+        Input('crosstab-by', 'value'),
+        *filter_inputs,
     )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'employment': px.bar(data_economic.iloc[2:], x="Activity", y="Percentage", 
-                         title="Employment Opportunities", height=chart_height,
-                         color_discrete_sequence=px.colors.qualitative.Set3)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Activity",
-        yaxis_title="Percentage",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
+    def update_crosstab(question, by, *values):
+        # Slicing the precomputed cube: cheap enough to answer on the request thread
+        return crosstab_figure(current_cube(), question, by, dict(zip(FILTERS, values)), FILTERS[by])
+
+
+def job_status(job):
+    return f"Updating… {job['progress']:.0%} {job['message']}".strip()
+
+
+if section_switching == "client":
+    # Swap the displayed figure in the browser; no request reaches the server
+    app.clientside_callback(
+        """
+        function() {
+            const store = arguments[arguments.length - 2];
+            let active = arguments[arguments.length - 1];
+            const triggered = dash_clientside.callback_context.triggered;
+            if (triggered.length && triggered[0].prop_id !== '.') {
+                const triggeredId = triggered[0].prop_id.split('.')[0];
+                if (triggeredId in store.buttons) {
+                    active = triggeredId;
+                }
+            }
+            if (!active) {
+                return [dash_clientside.no_update, {'display': 'none'}, {'display': 'block'}, null];
+            }
+            const figure = store.figures[store.buttons[active]];
+            const layout = Object.assign({template: store.template}, figure.layout);
+            return [Object.assign({}, figure, {layout: layout}), {'display': 'block'}, {'display': 'none'}, active];
+        }
+        """,
+        Output('content-graph', 'figure'),
+        Output('content-graph', 'style'),
+        Output('welcome', 'style'),
+        Output('active-section', 'data'),
+        *button_inputs,
+        Input('figure-store', 'data'),
+        State('active-section', 'data'),
     )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'wellbeing': px.bar(data_wellbeing.melt(id_vars="Year", var_name="Rating", value_name="Percentage"),
-                        x="Year", y="Percentage", color="Rating", barmode="group", 
-                        title="Well-being Ratings", height=chart_height, 
-                        color_discrete_sequence=px.colors.qualitative.T10)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Year",
-        yaxis_title="Percentage",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
+
+    # Filters re-aggregate on the server and replace every figure in the store at once
+    @app.callback(
+        Output('figure-store', 'data'),
+        Output('pending-job', 'data'),
+        Output('job-poll', 'disabled'),
+        Output('job-status', 'children'),
+        *filter_inputs,
+        prevent_initial_call=True,
     )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'community': px.bar(data_community, x="Improvement", y="Percentage", orientation="h",
-                        title="Community Benefits", height=chart_height, 
-                        color_discrete_sequence=px.colors.sequential.Mint)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Percentage",
-        yaxis_title="Improvement",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
+    def update_figure_store(*values):
+        filters = dict(zip(FILTERS, values))
+        if not background_jobs or not normalize_filters(filters):
+            return figure_store_data(filters), None, True, ""
+        queue = job_queue()
+        figures, pending = {}, {}
+        for name in set(button_figures.values()):
+            figures[name] = cached_figure(name, filters)
+            if figures[name] is None:
+                job = queue.get(queue.submit("filters:filtered_figure_job", figure_job_params(name, filters)))
+                if job['status'] == 'done':
+                    figures[name] = job['result']
+                    remember_figure(name, filters, figures[name])
+                else:
+                    pending[name] = job['id']
+        if not pending:
+            return figure_store_data(filters, figures), None, True, ""
+        # The store keeps the current figures until every job is done
+        return dash.no_update, {'jobs': pending, 'filters': filters}, False, "Updating…"
+
+    @app.callback(
+        Output('figure-store', 'data', allow_duplicate=True),
+        Output('pending-job', 'data', allow_duplicate=True),
+        Output('job-poll', 'disabled', allow_duplicate=True),
+        Output('job-status', 'children', allow_duplicate=True),
+        Input('job-poll', 'n_intervals'),
+        State('pending-job', 'data'),
+        prevent_initial_call=True,
     )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'benefits': px.pie(data_benefits, names="Category", values="Percentage", 
-                       title="Significant Benefits", height=chart_height,
-                       color_discrete_sequence=px.colors.qualitative.Bold)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        margin=dict(l=20, r=20, t=40, b=20),
-        showlegend=True,
-        legend_title=dict(text="Benefits", font=dict(size=12, color=text_color)),
-        font=dict(size=14, color=text_color)
+    def poll_store_jobs(_, pending):
+        if not pending:
+            return dash.no_update, None, True, ""
+        queue = job_queue()
+        jobs = {name: queue.get(identifier) for name, identifier in pending['jobs'].items()}
+        for job in jobs.values():
+            if job is None or job['status'] == 'failed':
+                message = f"Update failed: {job['message']}" if job else ""
+                return dash.no_update, None, True, message
+        done = sum(job['status'] == 'done' for job in jobs.values())
+        if done < len(jobs):
+            progress = sum(job['progress'] for job in jobs.values()) / len(jobs)
+            return dash.no_update, dash.no_update, False, f"Updating… {progress:.0%} ({done} of {len(jobs)} figures)"
+        filters = pending['filters']
+        figures = {}
+        for name in set(button_figures.values()):
+            if name in jobs:
+                figures[name] = jobs[name]['result']
+                remember_figure(name, filters, figures[name])
+            else:
+                # Cached when the filters changed; recomputed only if evicted since
+                figures[name] = cached_figure(name, filters) or current_figure(name, filters)
+        return figure_store_data(filters, figures), None, True, ""
+else:
+    # Define the callback to update the content based on button clicks and filters
+    @app.callback(
+        Output('content', 'children'),
+        Output('active-section', 'data'),
+        Output('pending-job', 'data'),
+        Output('job-poll', 'disabled'),
+        Output('job-status', 'children'),
+        *button_inputs,
+        *filter_inputs,
+        State('active-section', 'data'),
     )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-
-    'suggestions': px.bar(data_suggestions, x="Suggestion", y="Frequency", 
-                          title="Suggestions Distribution", height=chart_height,
-                          color_discrete_sequence=px.colors.qualitative.Safe)
-    .update_layout(
-        paper_bgcolor=bg_color,
-        plot_bgcolor=bg_color,
-        title_font=dict(size=18, color=text_color),
-        xaxis_title="Suggestion",
-        yaxis_title="Frequency",
-        margin=dict(l=30, r=30, t=40, b=30),
-        showlegend=True,
-        font=dict(size=14, color=text_color)
+    def update_content(*args):
+        ctx = dash.callback_context
+        filters = dict(zip(FILTERS, args[len(button_figures):-1]))
+        active = args[-1]
+
+        if not ctx.triggered:
+            return welcome, None, None, True, ""
+
+        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+        if button_id in button_figures:
+            active = button_id
+        elif not active:
+            # A filter changed before any section was picked
+            raise PreventUpdate
+
+        name = button_figures[active]
+        if not background_jobs or not normalize_filters(filters):
+            return dcc.Graph(figure=current_figure(name, filters)), active, None, True, ""
+
+        figure = cached_figure(name, filters)
+        if figure is None:
+            queue = job_queue()
+            job = queue.get(queue.submit("filters:filtered_figure_job", figure_job_params(name, filters)))
+            if job['status'] != 'done':
+                # Keep the figure on screen (or this section's unfiltered one) until the job is done
+                content = dcc.Graph(figure=figure_cache.get(name)) if button_id in button_figures else dash.no_update
+                pending = {'id': job['id'], 'section': active, 'name': name, 'filters': filters}
+                return content, active, pending, False, job_status(job)
+            figure = job['result']
+            remember_figure(name, filters, figure)
+        return dcc.Graph(figure=figure), active, None, True, ""
+
+    @app.callback(
+        Output('content', 'children', allow_duplicate=True),
+        Output('pending-job', 'data', allow_duplicate=True),
+        Output('job-poll', 'disabled', allow_duplicate=True),
+        Output('job-status', 'children', allow_duplicate=True),
+        Input('job-poll', 'n_intervals'),
+        State('pending-job', 'data'),
+        State('active-section', 'data'),
+        prevent_initial_call=True,
     )
-    .update_traces(marker=dict(line=dict(color=border_color, width=1))),
-}
-
-# Define the layout of the app
-app.layout = html.Div([
-    html.Div([
-        html.Div([
-            html.H2("Dashboard", style={'color': 'white', 'text-align': 'center'}),
-            html.Hr(style={'border': '1px solid #ccc'}),
-            html.Div([
-                html.Button("Demograph", id="demograph-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Household Water Improvement", id="household-water-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Agriculture and Irrigation Water Improvement", id="agriculture-water-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Yield from Agriculture", id="yield-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Crops", id="crops-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Economic Growth", id="economic-growth-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Livestock", id="livestock-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Well-being and Community Benefits", id="well-being-btn", n_clicks=0, className="sidebar-button"),
-                html.Button("Suggestions", id="suggestions-btn", n_clicks=0, className="sidebar-button"),
-            ], style={'display': 'flex', 'flexDirection': 'column'}),
-        ], id="sidebar", style={
-            'width': '20%', 'height': '100%', 'position': 'fixed', 'top': '0', 'left': '0',
-            'background-color': '#2c3e50', 'padding': '20px', 'color': 'white'
-        }),
-
-        # Main Content Area
-        html.Div(id="content", style={'margin-left': '20%', 'padding': '20px', 'background-color': '#ecf0f1'})
-    ], style={'display': 'flex'}),
-])
-
-# Define the callback to update the content based on button clicks
-@app.callback(
-    Output('content', 'children'),
-    Input('demograph-btn', 'n_clicks'),
-    Input('household-water-btn', 'n_clicks'),
-    Input('agriculture-water-btn', 'n_clicks'),
-    Input('yield-btn', 'n_clicks'),
-    Input('crops-btn', 'n_clicks'),
-    Input('economic-growth-btn', 'n_clicks'),
-    Input('livestock-btn', 'n_clicks'),
-    Input('well-being-btn', 'n_clicks'),
-    Input('suggestions-btn', 'n_clicks')
-)
-def update_content(demograph_clicks, household_water_clicks, agriculture_water_clicks,
-                   yield_clicks, crops_clicks, economic_growth_clicks, livestock_clicks, 
-                   well_being_clicks, suggestions_clicks):
-    ctx = dash.callback_context
-
-    if not ctx.triggered:
-        return html.Div(["Welcome to the Dashboard!"])
-
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-
-    if button_id == 'demograph-btn':
-        return dcc.Graph(figure=figures['demographics'])
-    elif button_id == 'household-water-btn':
-        return dcc.Graph(figure=figures['water_availability'])
-    elif button_id == 'agriculture-water-btn':
-        return dcc.Graph(figure=figures['agri_water'])
-    elif button_id == 'yield-btn':
-        return dcc.Graph(figure=figures['yield_changes'])
-    elif button_id == 'crops-btn':
-        return dcc.Graph(figure=figures['crop_types'])
-    elif button_id == 'economic-growth-btn':
-        return dcc.Graph(figure=figures['economic'])
-    elif button_id == 'livestock-btn':
-        return dcc.Graph(figure=figures['employment'])
-    elif button_id == 'well-being-btn':
-        return dcc.Graph(figure=figures['wellbeing'])
-    elif button_id == 'suggestions-btn':
-        return dcc.Graph(figure=figures['suggestions'])
-    else:
-        return html.Div([
-            html.H3("Other Section", style={'text-align': 'center'}),
-            html.P("This is where the content for other sections will appear.", style={'text-align': 'center'}),
-        ])
+    def poll_job(_, pending, active):
+        job = job_queue().get(pending['id']) if pending else None
+        if job is None:
+            return dash.no_update, None, True, ""
+        if job['status'] == 'failed':
+            return dash.no_update, None, True, f"Update failed: {job['message']}"
+        if job['status'] != 'done':
+            return dash.no_update, dash.no_update, False, job_status(job)
+        remember_figure(pending['name'], pending['filters'], job['result'])
+        if pending['section'] != active:
+            # The user moved on; the result stays cached for when they come back
+            return dash.no_update, None, True, ""
+        return dcc.Graph(figure=job['result']), None, True, ""
 
 if __name__ == "__main__":
-    app.run_server(debug=True)
+    if "--payload-report" in sys.argv:
+        print_switching_report(figure_cache, button_figures)
+    else:
+        app.run_server(debug=True)
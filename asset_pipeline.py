@@ -0,0 +1,221 @@
+"""Local, fingerprinted asset bundles for the dashboards.
+
+Each entry point gets one CSS bundle, made of:
+
+1. vendored third-party CSS (Bootstrap) from vendor/
+2. the shared assets/*.css
+3. its own assets/pages/<entry point>.css
+
+All entry points share one JS bundle of assets/*.js. Bundles are minified and
+written to build/bundles/ under a content hash (e.g.
+main_version1.3f9a0c1e2b4d.css), with gzip (and, with the optional `brotli`
+package, brotli) copies alongside. They are served from /bundles/ with ETags
+and `Cache-Control: public, max-age=31536000, immutable`. A changed file gets
+a new name, so browsers never need to revalidate and a repeat visit requests
+no assets at all. Dash's own fingerprinted component scripts and the favicon
+are marked immutable as well, and a vendored partial plotly.js (see
+plotly_bundle.py) replaces the full one dcc.Graph would load.
+
+    python asset_pipeline.py vendor    # download Bootstrap into vendor/ once
+    python asset_pipeline.py build     # build the bundles and print their sizes
+
+If vendor/bootstrap.min.css is missing, Bootstrap is loaded from its CDN as
+before.
+"""
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import urllib.request
+import warnings
+
+import dash_bootstrap_components as dbc
+
+from compression import negotiate
+from plotly_bundle import partial_bundle
+
+try:
+    import brotli
+except ImportError:  # optional; gzip copies are always written
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(ROOT, "assets")
+PAGES_DIR = os.path.join(ASSETS_DIR, "pages")
+VENDOR_DIR = os.path.join(ROOT, "vendor")
+BUILD_DIR = os.path.join(ROOT, "build", "bundles")
+ROUTE = "/bundles/"
+ONE_YEAR = 365 * 24 * 3600
+
+# Vendored stylesheet name -> the CDN URL it is downloaded from
+VENDOR = {
+    "bootstrap": dbc.themes.BOOTSTRAP,
+}
+
+# Dash serves assets/ itself; leave only non-CSS/JS files (images) to it
+ASSETS_IGNORE = r".*\.(css|js)$"
+
+ENCODED_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+# dcc.Graph fetches plotly.js from window._dashPlotlyJSURL, which the Dash
+# renderer sets when it mounts; pin it to the partial bundle instead
+PLOTLY_LOADER = """(function () {
+var url = '%s';
+Object.defineProperty(window, '_dashPlotlyJSURL', {get: function () { return url; }, set: function () {}});
+})();"""
+
+CSS_COMMENT = re.compile(r"/\*(?!!).*?\*/", re.S)
+CSS_SPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+JS_LINE_COMMENT = re.compile(r"^\s*//.*$", re.M)
+
+
+def minify_css(text):
+    # /*! ... */ license comments are kept
+    text = CSS_COMMENT.sub("", text)
+    text = CSS_SPACE.sub(" ", text)
+    text = CSS_PUNCTUATION.sub(r"\1", text)
+    return text.replace(": ", ":").replace(";}", "}").strip()
+
+
+def minify_js(text):
+    # Only whole-line comments and indentation: safe without a JS parser
+    lines = (line.strip() for line in JS_LINE_COMMENT.sub("", text).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def vendored_path(name):
+    return os.path.join(VENDOR_DIR, f"{name}.min.css")
+
+
+def vendor(names=VENDOR):
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    for name in names:
+        with urllib.request.urlopen(VENDOR[name]) as response:
+            data = response.read()
+        write_atomic(vendored_path(name), data)
+        print(f"{VENDOR[name]} -> {vendored_path(name)} ({len(data)} bytes)")
+
+
+def read_sources(paths):
+    parts = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            parts.append(f.read())
+    return parts
+
+
+def build_bundle(name, extension, text):
+    """Write a fingerprinted bundle plus compressed copies; returns its file name."""
+    data = text.encode("utf-8")
+    filename = f"{name}.{hashlib.sha256(data).hexdigest()[:12]}.{extension}"
+    path = os.path.join(BUILD_DIR, filename)
+    if not os.path.exists(path):
+        os.makedirs(BUILD_DIR, exist_ok=True)
+        write_atomic(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            write_atomic(path + ".br", brotli.compress(data, quality=11))
+        # Written last: its presence means the compressed copies exist too
+        write_atomic(path, data)
+    return filename
+
+
+def write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def top_level(directory, extension):
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(extension)]
+
+
+def dash_assets(page=None, vendored=()):
+    """Dash() keyword arguments that load the bundles instead of assets/ and CDN files."""
+    external, css_paths = [], []
+    for name in vendored:
+        if os.path.exists(vendored_path(name)):
+            css_paths.append(vendored_path(name))
+        else:
+            warnings.warn(f"{vendored_path(name)} is missing; loading {name} from its CDN. "
+                          f"Run `python asset_pipeline.py vendor` to serve it locally.")
+            external.append(VENDOR[name])
+    css_paths += top_level(ASSETS_DIR, ".css")
+    if page and os.path.exists(os.path.join(PAGES_DIR, f"{page}.css")):
+        css_paths.append(os.path.join(PAGES_DIR, f"{page}.css"))
+
+    css = build_bundle(page or "app", "css", "\n".join(minify_css(text) for text in read_sources(css_paths)))
+    scripts = [minify_js(text) for text in read_sources(top_level(ASSETS_DIR, ".js"))]
+    plotly_js = partial_bundle()
+    if plotly_js:
+        # Already minified upstream; only fingerprinted and precompressed here
+        scripts.append(PLOTLY_LOADER % (ROUTE + build_bundle("plotly", "js", read_sources([plotly_js])[0])))
+    # Statements are separated by a newline and ';' in case a file omits its last ';'
+    js = build_bundle("app", "js", "\n;".join(scripts))
+    return {
+        "external_stylesheets": external + [ROUTE + css],
+        "external_scripts": [ROUTE + js],
+        "assets_ignore": ASSETS_IGNORE,
+    }
+
+
+def install_bundles(server):
+    """Serve /bundles/ and mark already-fingerprinted Dash resources immutable."""
+    import flask
+
+    @server.route(ROUTE + "<path:filename>")
+    def serve_bundle(filename):
+        mimetype = mimetypes.guess_type(filename)[0]
+        encoding = negotiate(flask.request.headers.get("Accept-Encoding", ""))
+        suffix = ENCODED_SUFFIXES.get(encoding)
+        if suffix and os.path.exists(os.path.join(BUILD_DIR, filename + suffix)):
+            response = flask.send_from_directory(BUILD_DIR, filename + suffix, mimetype=mimetype, max_age=ONE_YEAR)
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = flask.send_from_directory(BUILD_DIR, filename, mimetype=mimetype, max_age=ONE_YEAR)
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    @server.after_request
+    def immutable_dash_resources(response):
+        # Component suite URLs carry the package version and the favicon a ?v= query
+        path = flask.request.path
+        fingerprinted = (path.startswith("/_dash-component-suites/") and response.cache_control.max_age
+                         or path == "/_favicon.ico" and "v" in flask.request.args)
+        if response.status_code == 200 and fingerprinted:
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor and bundle the dashboards' static assets")
+    parser.add_argument("command", choices=("vendor", "build"))
+    args = parser.parse_args()
+    if args.command == "vendor":
+        vendor()
+        return
+    pages = [None] + [name[:-len(".css")] for name in sorted(os.listdir(PAGES_DIR)) if name.endswith(".css")]
+    bundles = []
+    for page in pages:
+        options = dash_assets(page, vendored=VENDOR if page else ())
+        for url in options["external_stylesheets"] + options["external_scripts"]:
+            if url.startswith(ROUTE) and url[len(ROUTE):] not in bundles:
+                bundles.append(url[len(ROUTE):])
+    print(f"{'bundle':<44}{'bytes':>10}{'gzip bytes':>12}")
+    for filename in bundles:
+        path = os.path.join(BUILD_DIR, filename)
+        print(f"{filename:<44}{os.path.getsize(path):>10}{os.path.getsize(path + '.gz'):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+// Reports which .lazy-section elements have scrolled into view so the server
+// only renders a dashboard section once it is about to be seen.
+(function () {
+    var seen = {};
+    var attempts = 0;
+
+    function observe() {
+        var sections = document.querySelectorAll('.lazy-section');
+        if (!sections.length || !window.dash_clientside || !window.dash_clientside.set_props) {
+            return false;
+        }
+        var observer = new IntersectionObserver(function (entries) {
+            var changed = false;
+            entries.forEach(function (entry) {
+                var key = entry.target.dataset.section;
+                if (entry.isIntersecting && !seen[key]) {
+                    seen[key] = true;
+                    changed = true;
+                }
+            });
+            if (changed) {
+                window.dash_clientside.set_props('visible-sections', {data: Object.keys(seen)});
+            }
+        }, {rootMargin: '200px'});
+        sections.forEach(function (section) {
+            observer.observe(section);
+        });
+        return true;
+    }
+
+    // The Dash layout renders after asset scripts run; wait for it, and give up
+    // after a few seconds on pages without lazy sections
+    var timer = setInterval(function () {
+        attempts += 1;
+        if (observe() || attempts > 50) {
+            clearInterval(timer);
+        }
+    }, 200);
+})();
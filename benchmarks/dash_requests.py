@@ -0,0 +1,34 @@
+"""Dash callback requests for benchmarking the entry points without a browser."""
+import json
+
+
+def callback_requests(dependencies):
+    """(label, body) pairs for /_dash-update-component, built from /_dash-dependencies.
+
+    app5.4's update_content gets one request per sidebar button and
+    main_version1 one per lazily rendered section; pages without such
+    callbacks get none.
+    """
+    requests = []
+    for dependency in dependencies:
+        output = dependency["output"]
+        outputs = [dict(zip(("id", "property"), o.rsplit(".", 1))) for o in output.strip(".").split("...")]
+        body = {
+            "output": output,
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "state": [dict(s, value=None) for s in dependency["state"]],
+        }
+        if "content.children" in output:
+            for button in (i["id"] for i in dependency["inputs"] if i["property"] == "n_clicks"):
+                inputs = [dict(i, value=1 if i["id"] == button else None) for i in dependency["inputs"]]
+                requests.append((button, dict(body, inputs=inputs, changedPropIds=[f"{button}.n_clicks"])))
+        elif "-body.children" in output:
+            section = outputs[0]["id"][:-len("-body")]
+            inputs = [dict(i, value=f"#{section}" if i["property"] == "hash" else None) for i in dependency["inputs"]]
+            state = [dict(s, value="section-placeholder") for s in dependency["state"]]
+            requests.append((section, dict(body, inputs=inputs, state=state, changedPropIds=["url.hash"])))
+    return requests
+
+
+def encode(body):
+    return json.dumps(body)
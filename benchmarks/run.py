@@ -0,0 +1,177 @@
+"""Benchmark suite for the dashboard entry points.
+
+    python benchmarks/run.py [--label NAME] [app5.4 main_version1 main_version2]
+    python benchmarks/run.py --compare OLD.json NEW.json
+
+Each entry point is measured in a fresh interpreter, in-process through
+Flask's test client (no browser or server):
+
+- import and layout-construction time
+- time to build and serialize each entry in the figure registry
+- time for one bootstrap pass over all charts' confidence intervals
+- callback latency per sidebar button / section
+- serialized layout, callback response and figure payload bytes
+- peak resident memory
+
+Results go to benchmarks/results/<label>.json for comparison between versions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.insert(0, ROOT)
+
+from dash_requests import callback_requests  # noqa: E402
+from entry_points import ENTRY_POINTS  # noqa: E402
+
+REPEATS = 20
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(entry_point):
+    start = time.perf_counter()
+    from entry_points import load_entry_point
+
+    module = load_entry_point(entry_point)
+    import_s = time.perf_counter() - start
+
+    app = module.app
+    client = app.server.test_client()
+    start = time.perf_counter()
+    layout = client.get("/_dash-layout").data
+    layout_s = time.perf_counter() - start
+    index = client.get("/").data
+    dependencies = json.loads(client.get("/_dash-dependencies").data)
+
+    from bootstrap import bootstrap_intervals, interval_cache
+    from datasets import load_datasets
+    from figure_cache import serialize
+    from figure_registry import FIGURE_SPECS, FigureRegistry
+
+    interval_cache.clear()
+    start = time.perf_counter()
+    bootstrap_intervals(FIGURE_SPECS, load_datasets())
+    bootstrap_s = time.perf_counter() - start
+
+    figures = {}
+    registry = FigureRegistry()
+    for name in registry:
+        start = time.perf_counter()
+        figure = registry[name]
+        built = time.perf_counter()
+        data = serialize(figure)
+        figures[name] = {
+            "build_s": built - start,
+            "serialize_s": time.perf_counter() - built,
+            "bytes": len(data),
+        }
+
+    callbacks = {}
+    for label, body in callback_requests(dependencies):
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            response = client.post("/_dash-update-component", json=body)
+            timings.append(time.perf_counter() - start)
+        callbacks[label] = {
+            "first_s": timings[0],
+            "median_s": statistics.median(timings[1:]),
+            "status": response.status_code,
+            "bytes": len(response.data),
+        }
+
+    return {
+        "import_s": import_s,
+        "first_layout_s": layout_s,
+        "layout_bytes": len(layout),
+        "index_bytes": len(index),
+        "figures": figures,
+        "bootstrap_s": bootstrap_s,
+        "callbacks": callbacks,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run(entry_points, label):
+    results = {"label": label, "python": sys.version.split()[0], "entry_points": {}}
+    for entry_point in entry_points:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", entry_point], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        results["entry_points"][entry_point] = json.loads(output.splitlines()[-1])
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path, results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = flatten(json.load(f)["entry_points"])
+    with open(new_path) as f:
+        new = flatten(json.load(f)["entry_points"])
+    print(f"{'metric':<64}{'old':>14}{'new':>14}{'change':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        if key.endswith(".status"):
+            continue
+        change = f"{100 * (new[key] - old[key]) / old[key]:+.0f}%" if old[key] else ""
+        print(f"{key:<64}{old[key]:>14.4g}{new[key]:>14.4g}{change:>9}")
+
+
+def summarize(results):
+    print(f"{'entry point':<16}{'import s':>10}{'layout KB':>11}{'figures s':>11}{'callback ms':>13}{'peak MB':>9}")
+    for entry_point, stats in results["entry_points"].items():
+        figures_s = sum(f["build_s"] + f["serialize_s"] for f in stats["figures"].values())
+        callbacks = [c["median_s"] for c in stats["callbacks"].values()]
+        callback_ms = f"{1000 * statistics.median(callbacks):.2f}" if callbacks else "-"
+        peak = stats["peak_rss_bytes"]
+        print(f"{entry_point:<16}{stats['import_s']:>10.2f}{stats['layout_bytes'] / 1024:>11.1f}"
+              f"{figures_s:>11.2f}{callback_ms:>13}{peak / 2**20 if peak else 0:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard entry points")
+    parser.add_argument("entry_points", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--label", default=time.strftime("%Y%m%d-%H%M%S"))
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        path, results = run(args.entry_points, args.label)
+        summarize(results)
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Shared (cross-worker) cache against per-process caching under serve.py.
+
+    ALKOD_SURVEY_STORE=store/ python benchmarks/shared_cache_bench.py --workers 4 --clients 8 --passes 3
+
+Starts app5.4 with several Gunicorn workers twice: once with only the
+per-process caches (ALKOD_SHARED_CACHE empty) and once with a fresh shared
+cache. Both times, concurrent clients go through every sidebar section under
+every village filter `--passes` times. Each distinct request is expensive
+the first time anywhere (or, without the shared cache, the first time in each
+worker). Filtered views are aggregated inline (ALKOD_BACKGROUND_JOBS=0) so
+their cost shows in the latencies. Prints wall time, latency percentiles and
+the workers' resident memory, and writes them as JSON to benchmarks/results/.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dash_requests import callback_requests, encode  # noqa: E402
+from throughput import fetch, stop  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def start(port, workers, threads, env):
+    command = [sys.executable, os.path.join(ROOT, "serve.py"), "app5.4", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "--threads", str(threads)]
+    process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/_dash-dependencies")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    stop(process)
+    raise RuntimeError("server did not start")
+
+
+def component_props(layout, component_id):
+    if isinstance(layout, dict):
+        props = layout.get("props", {})
+        if props.get("id") == component_id:
+            return props
+        children = props.get("children")
+        return component_props(children if isinstance(children, list) else [children], component_id)
+    for child in layout if isinstance(layout, list) else ():
+        found = component_props(child, component_id)
+        if found is not None:
+            return found
+    return None
+
+
+def filtered_requests(port):
+    """One update_content request per sidebar button and village."""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    _, dependencies = fetch(connection, "GET", "/_dash-dependencies", None)
+    _, layout = fetch(connection, "GET", "/_dash-layout", None)
+    options = component_props(json.loads(layout), "filter-village")["options"]
+    villages = [option["value"] if isinstance(option, dict) else option for option in options]
+    if not villages:
+        raise SystemExit("No village filter: set ALKOD_SURVEY_STORE to a survey store")
+    requests = []
+    for _, body in callback_requests(json.loads(dependencies)):
+        for village in villages:
+            inputs = [dict(i, value=[village]) if i["id"] == "filter-village" else i for i in body["inputs"]]
+            requests.append(("POST", "/_dash-update-component", encode(dict(body, inputs=inputs))))
+    return requests
+
+
+def worker_rss(process):
+    """Resident memory of the server's worker processes, in MB."""
+    total = 0
+    with open(f"/proc/{process.pid}/task/{process.pid}/children") as f:
+        children = f.read().split()
+    for pid in children:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+    return round(total / 1024, 1), len(children)
+
+
+def run(port, requests, clients, passes):
+    queue = [request for _ in range(passes) for request in requests]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        while True:
+            with lock:
+                if not queue:
+                    return
+                request = queue.pop(0)
+            start_time = time.perf_counter()
+            status, _ = fetch(connection, *request)
+            with lock:
+                (latencies if status == 200 else errors).append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start_time
+    samples = sorted(latencies)
+
+    def percentile(p):
+        return round(1000 * samples[min(len(samples) - 1, int(p * len(samples)))], 1) if samples else None
+
+    return {"requests": len(samples), "errors": len(errors), "wall_s": round(wall, 2),
+            "p50_ms": percentile(0.50), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    results = {"workers": args.workers, "clients": args.clients, "passes": args.passes, "modes": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = {
+            "per-process": {"ALKOD_SHARED_CACHE": ""},
+            "shared": {"ALKOD_SHARED_CACHE": os.path.join(tmp, "shared.sqlite")},
+        }
+        for mode, env in modes.items():
+            env = dict(env, ALKOD_BACKGROUND_JOBS="0", ALKOD_JOB_DB=os.path.join(tmp, f"{mode}-jobs.sqlite"))
+            process = start(args.port, args.workers, args.threads, env)
+            try:
+                requests = filtered_requests(args.port)
+                stats = run(args.port, requests, args.clients, args.passes)
+                stats["distinct_requests"] = len(requests)
+                stats["worker_rss_mb"], stats["worker_processes"] = worker_rss(process)
+                if env["ALKOD_SHARED_CACHE"]:
+                    stats["shared_cache_mb"] = round(os.path.getsize(env["ALKOD_SHARED_CACHE"]) / 2**20, 1)
+                results["modes"][mode] = stats
+            finally:
+                stop(process)
+
+    print(f"app5.4, {args.workers} workers: {args.clients} clients, {args.passes} passes over "
+          f"{results['modes']['shared']['distinct_requests']} filtered requests")
+    print(f"{'cache':<13}{'wall s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'RSS MB':>9}{'errors':>8}")
+    for mode, stats in results["modes"].items():
+        print(f"{mode:<13}{stats['wall_s']:>8}{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+              f"{stats['worker_rss_mb']:>9}{stats['errors']:>8}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"shared-cache-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Throughput of the Dash dev server against the production server (serve.py).
+
+    python benchmarks/throughput.py app5.4 --clients 16 --duration 10
+
+Starts each server as a subprocess, checks both return the same response, then
+drives it with concurrent keep-alive clients for a fixed time. The scenario is
+the entry point's callbacks (app5.4's sidebar buttons, main_version1's
+sections) or, where there are none, a full page load. Results are printed
+and written as JSON to benchmarks/results/.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dash_requests import callback_requests, encode  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+DEV_SERVER = (
+    "import sys; from entry_points import load_entry_point; "
+    "load_entry_point(sys.argv[1]).app.run(debug=True, host='127.0.0.1', port=int(sys.argv[2]))"
+)
+
+
+def start(kind, entry_point, port, workers, threads):
+    if kind == "dev":
+        command = [sys.executable, "-c", DEV_SERVER, entry_point, str(port)]
+    else:
+        command = [sys.executable, os.path.join(ROOT, "serve.py"), entry_point, "--bind", f"127.0.0.1:{port}",
+                   "--workers", str(workers), "--threads", str(threads)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/_dash-dependencies")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    stop(process)
+    raise RuntimeError(f"{kind} server for {entry_point} did not start")
+
+
+def stop(process):
+    # The dev server's reloader runs the app in a child process; stop the whole group
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait()
+
+
+def scenario_requests(port):
+    """(method, path, body) requests for the scenario the entry point supports."""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", "/_dash-dependencies")
+    callbacks = callback_requests(json.loads(connection.getresponse().read()))
+    if callbacks:
+        return "callback", [("POST", "/_dash-update-component", encode(body)) for _, body in callbacks]
+    return "page", [("GET", "/", None), ("GET", "/_dash-layout", None), ("GET", "/_dash-dependencies", None)]
+
+
+def fetch(connection, method, path, body):
+    headers = {"Content-Type": "application/json"} if body else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def load(port, requests, clients, duration):
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = index
+        while time.perf_counter() < stop_at:
+            method, path, body = requests[i % len(requests)]
+            i += 1
+            start_time = time.perf_counter()
+            try:
+                status, _ = fetch(connection, method, path, body)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                status = None
+            if status == 200:
+                latencies[index].append(time.perf_counter() - start_time)
+            else:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    samples = sorted(s for per_client in latencies for s in per_client)
+
+    def percentile(p):
+        return round(1000 * samples[min(len(samples) - 1, int(p * len(samples)))], 2) if samples else None
+
+    return {
+        "requests": len(samples),
+        "errors": sum(errors),
+        "requests_per_second": round(len(samples) / duration, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entry_point", nargs="?", default="app5.4")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    results = {"entry_point": args.entry_point, "clients": args.clients, "duration_s": args.duration,
+               "workers": args.workers, "threads": args.threads, "servers": {}}
+    responses = {}
+    for kind in ("dev", "production"):
+        process = start(kind, args.entry_point, args.port, args.workers, args.threads)
+        try:
+            scenario, requests = scenario_requests(args.port)
+            connection = http.client.HTTPConnection("127.0.0.1", args.port)
+            # Also warms up first-request setup before anything is timed
+            responses[kind] = [fetch(connection, *request) for request in requests]
+            results["scenario"] = scenario
+            results["servers"][kind] = load(args.port, requests, args.clients, args.duration)
+        finally:
+            stop(process)
+
+    if responses["dev"] != responses["production"]:
+        raise SystemExit("dev and production servers returned different responses")
+
+    print(f"{args.entry_point} / {results['scenario']}: {args.clients} clients for {args.duration:g}s")
+    print(f"{'server':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for kind, stats in results["servers"].items():
+        print(f"{kind:<12}{stats['requests_per_second']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['errors']:>8}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"throughput-{args.entry_point}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
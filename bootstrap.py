@@ -0,0 +1,138 @@
+"""Bootstrap confidence intervals for the survey percentages.
+
+Every bar in the registry is a category's share of a group of respondents: a
+year, or all responses when the table has no Year column. All groups of all
+bar charts are resampled together in one pass. Each group gets
+ALKOD_BOOTSTRAP_REPLICATES multinomial draws over its observed counts, so
+there is no Python loop over replicates, charts or categories. Percentile
+intervals at LEVEL come out in the plotted units and are drawn as error bars.
+
+Tables aggregated from survey responses record their respondents per group in
+`frame.attrs["respondents"]`. A hand-typed table in datasets.py that plots
+respondent counts (a COUNT_COLUMNS column) has its sample size in the counts
+themselves. The other hand-typed tables plot percentages of an unknown number
+of respondents and get no error bars, unless ALKOD_NOMINAL_RESPONDENTS is set
+to assume that many per group.
+Intervals are cached by a hash of their inputs, so each data version is
+resampled once. Set ALKOD_BOOTSTRAP_REPLICATES=0 to draw no error bars.
+"""
+import hashlib
+import os
+
+import numpy as np
+from pandas.api.types import is_numeric_dtype
+
+from result_cache import LRUCache
+
+REPLICATES = int(os.environ.get("ALKOD_BOOTSTRAP_REPLICATES", 2000))
+NOMINAL_RESPONDENTS = int(os.environ["ALKOD_NOMINAL_RESPONDENTS"]) if os.environ.get("ALKOD_NOMINAL_RESPONDENTS") else None
+# Columns counting respondents, so that a group's counts add up to its sample size
+COUNT_COLUMNS = ("Respondents",)
+LEVEL = 0.95
+# Fixed so a figure, and therefore its cache key and payload, is reproducible
+SEED = 0
+GROUP = "Year"
+
+interval_cache = LRUCache(max_bytes=8 * 2**20)
+
+
+def settings():
+    """Everything besides the data that determines the intervals."""
+    return {"replicates": REPLICATES, "level": LEVEL, "seed": SEED, "nominal_respondents": NOMINAL_RESPONDENTS,
+            "count_columns": COUNT_COLUMNS}
+
+
+def plotted(spec, frame):
+    """(long frame, value column, value axis) of a bar chart spec, or None if it plots no shares."""
+    if spec["kind"] != "bar":
+        return None
+    if spec.get("melt"):
+        frame = frame.melt(**spec["melt"])
+    for axis in ("y", "x"):
+        column = spec.get(axis)
+        if column in frame and is_numeric_dtype(frame[column]):
+            return frame, column, axis
+    return None
+
+
+def respondents(frame, group, column, values):
+    """Sample size behind one group's `values`, or None if it is unknown."""
+    known = frame.attrs.get("respondents", {})
+    if str(group) in known or "" in known:
+        return int(known.get(str(group), known.get("")))
+    if column in COUNT_COLUMNS:
+        return int(round(values.sum()))
+    return NOMINAL_RESPONDENTS
+
+
+def bootstrap_intervals(specs, datasets, replicates=REPLICATES, level=LEVEL, seed=SEED):
+    """{name: {"axis", "plus", "minus"}} error bars for every bar chart in `specs`."""
+    if replicates <= 0:
+        return {}
+    charts, groups = {}, []
+    for name, spec in specs.items():
+        found = plotted(spec, datasets[spec["data"]])
+        if found is None:
+            continue
+        frame, column, axis = found
+        keys = frame[GROUP].astype(str) if GROUP in frame else np.zeros(len(frame), dtype=int)
+        chart_groups = []
+        for key, positions in frame.groupby(keys, sort=False).indices.items():
+            values = frame[column].to_numpy(dtype=float)[positions]
+            size = respondents(datasets[spec["data"]], key if GROUP in frame else "", column, values)
+            chart_groups.append((positions, values, size))
+        # No error bars rather than ones made up for an unknown sample size
+        if any(size is None for _, _, size in chart_groups):
+            continue
+        rows = []
+        for positions, values, size in chart_groups:
+            rows.append((len(groups), positions))
+            groups.append((values, size))
+        charts[name] = (axis, len(frame), frame[column].to_numpy(dtype=float), rows)
+    if not groups:
+        return {}
+
+    width = max(len(values) for values, _ in groups)
+    values = np.zeros((len(groups), width))
+    for i, (group_values, _) in enumerate(groups):
+        values[i, :len(group_values)] = np.clip(group_values, 0, None)
+    sizes = np.array([n for _, n in groups], dtype=np.int64)
+    totals = values.sum(axis=1)
+
+    digest = hashlib.sha1(values.tobytes() + sizes.tobytes())
+    digest.update(repr((replicates, level, seed)).encode())
+    low, high = interval_cache.get_or_compute(
+        digest.hexdigest(), lambda: share_intervals(values, sizes, replicates, level, seed),
+        lambda bounds: bounds[0].nbytes + bounds[1].nbytes,
+    )
+    # Shares back to the units the chart plots (percentages or counts)
+    low, high = low * totals[:, None], high * totals[:, None]
+
+    intervals = {}
+    for name, (axis, length, plotted_values, rows) in charts.items():
+        plus, minus = np.zeros(length), np.zeros(length)
+        for group, positions in rows:
+            count = len(positions)
+            plus[positions] = high[group, :count] - plotted_values[positions]
+            minus[positions] = plotted_values[positions] - low[group, :count]
+        intervals[name] = {"axis": axis, "plus": np.clip(plus, 0, None).round(2),
+                           "minus": np.clip(minus, 0, None).round(2)}
+    return intervals
+
+
+def share_intervals(values, sizes, replicates=REPLICATES, level=LEVEL, seed=SEED):
+    """Percentile bootstrap (low, high) shares for each row of category `values`.
+
+    Row i is resampled as `sizes[i]` respondents drawn with its observed
+    shares; all rows and replicates come from a single multinomial call.
+    """
+    totals = values.sum(axis=1, keepdims=True)
+    shares = np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+    # multinomial rejects rows summing past 1 by rounding error; empty rows draw nothing
+    shares[:, -1] = np.clip(1 - shares[:, :-1].sum(axis=1), 0, None) * (totals[:, 0] > 0)
+    sizes = np.where(totals[:, 0] > 0, sizes, 0)
+    draws = np.random.default_rng(seed).multinomial(sizes, shares, size=(replicates, len(sizes)))
+    resampled = draws / np.maximum(sizes, 1)[:, None]
+    tail = (1 - level) / 2
+    low, high = np.quantile(resampled, [tail, 1 - tail], axis=0)
+    return low, high
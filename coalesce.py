@@ -0,0 +1,72 @@
+"""Request coalescing (single-flight) for Dash callbacks.
+
+When a report link goes out, many users open the same section at once and
+their browsers send identical callback requests. A callback request whose
+body (outputs, inputs, state and trigger, compared as canonical JSON) and
+data version match one already being answered waits for that one. It then
+gets a copy of its response instead of running the callback again. Only
+requests in flight at the same moment are coalesced: remembering results is
+left to the caches underneath (figure_cache, filters), whose misses are
+coalesced the same way (result_cache.SingleFlight).
+
+Set ALKOD_COALESCE=0 to turn it off.
+"""
+import functools
+import hashlib
+import json
+import os
+
+import flask
+
+import metrics
+from result_cache import SingleFlight
+from snapshot import snapshot
+
+ENABLED = os.environ.get("ALKOD_COALESCE", "1") != "0"
+ROUTES = ("/_dash-update-component",)
+
+metrics.registry.help.update({
+    "alkod_coalesced_requests_total": "Requests answered with the response of an identical concurrent request",
+})
+
+in_flight = SingleFlight()
+
+
+def request_key():
+    body = flask.request.get_json(silent=True)
+    if body is None:
+        return None
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    return flask.request.path, hashlib.sha1(canonical.encode()).hexdigest(), snapshot().version
+
+
+def install_coalescing(server):
+    """Coalesce identical concurrent requests to the Dash callback route of `server`."""
+    if not ENABLED:
+        return server
+    for rule in server.url_map.iter_rules():
+        if rule.rule in ROUTES:
+            server.view_functions[rule.endpoint] = coalesced(server, server.view_functions[rule.endpoint])
+    return server
+
+
+def coalesced(server, view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request_key()
+        if key is None:
+            return view(*args, **kwargs)
+        led = []
+
+        def respond():
+            led.append(True)
+            response = server.make_response(view(*args, **kwargs))
+            # Frozen: every request gets its own Response for the after_request hooks to modify
+            return response.status_code, list(response.headers), response.get_data()
+
+        status, headers, body = in_flight.do(key, respond)
+        if not led:
+            metrics.inc("alkod_coalesced_requests_total", {"route": flask.request.path})
+        return flask.Response(body, status=status, headers=headers)
+
+    return wrapper
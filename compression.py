@@ -0,0 +1,90 @@
+"""Content-negotiated response compression.
+
+JSON, HTML, CSS and JavaScript responses of at least MIN_SIZE bytes are sent
+brotli- or gzip-encoded, whichever the client's Accept-Encoding prefers
+(brotli needs the optional `brotli` package). A dashboard's callback responses
+repeat, so compressed bodies are kept in an LRU cache keyed by a hash of the
+uncompressed body. A compressed response keeps the uncompressed body's ETag,
+marked weak: every encoding of the body carries it, and a strong validator
+would promise byte-identical bodies. Every candidate response gets
+`Vary: Accept-Encoding`. Set ALKOD_COMPRESSION=0 to
+turn compression off, e.g. behind a proxy that already compresses.
+"""
+import gzip
+import hashlib
+import os
+
+from result_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+ENABLED = os.environ.get("ALKOD_COMPRESSION", "1") != "0"
+MIN_SIZE = 500
+COMPRESSIBLE = ("application/json", "application/javascript", "text/")
+
+COMPRESSORS = {"gzip": lambda data: gzip.compress(data, compresslevel=6)}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=5)
+# Preferred first when the client weighs encodings equally
+PREFERENCE = ("br", "gzip")
+
+compressed_cache = LRUCache(max_bytes=int(os.environ.get("ALKOD_COMPRESSION_CACHE_MB", 32)) * 2**20)
+
+
+def negotiate(accept_encoding):
+    """The supported encoding the Accept-Encoding header ranks highest, or None."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    candidates = [
+        (weights.get(coding, weights.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(PREFERENCE) if coding in COMPRESSORS
+    ]
+    weight, _, coding = max(candidates)
+    return coding if weight > 0 else None
+
+
+def compress(data, encoding):
+    key = (encoding, hashlib.sha1(data).digest())
+    return compressed_cache.get_or_compute(key, lambda: COMPRESSORS[encoding](data), len)
+
+
+def install_compression(server):
+    """Compress eligible responses from the Flask `server`."""
+    if not ENABLED:
+        return server
+    import flask
+
+    @server.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers
+                or not (response.mimetype or "").startswith(COMPRESSIBLE)):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate(flask.request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return server
@@ -0,0 +1,310 @@
+"""Precomputed cross-tab cube over the survey microdata.
+
+Every question's respondent counts are held as one dense NumPy array over the
+demographic dimensions and the question's answers:
+
+    counts[question][year, village, gender, age_band, answer]
+
+Each axis is indexed by integer codes into that dimension's labels. A cross-tab
+of any question by any dimension, under any filters, is then answered by
+slicing and summing this array, in well under a millisecond, rather than by
+re-grouping the raw rows. The raking weights (see weighting.py) depend only on
+(year, gender, age_band), so weighted cross-tabs broadcast them over the same
+array.
+
+`crosstab_figure` draws one as a grouped bar chart of answer shares.
+
+The cube is built in one pass over a SurveyStore (ALKOD_SURVEY_STORE) or over
+the raw survey files (ALKOD_SURVEY_PATH). It is saved under build/cube/, keyed
+by the source's files, so server processes and restarts load it instead of
+counting again.
+
+    python cube.py wellbeing age_band --year 2024    # print a cross-tab
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import shared_cache
+from figure_cache import serialize
+from figure_registry import FIGURE_SPECS, build_figure, template_version
+from filters import normalize_filters
+from result_cache import LRUCache
+from survey_loader import TABLES, YEAR, as_categorical, cell_categorical, iter_chunks, survey_files, year_categorical
+from weighting import RAKE_COLUMNS, cell_weights, load_margins, margins_version
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CUBE_DIR = os.path.join(ROOT, "build", "cube")
+# Bump when the saved layout changes so stale files are rebuilt
+CUBE_FORMAT = 1
+
+# survey_store.VILLAGE; that module (and pyarrow) is only imported with a store configured
+VILLAGE = "village"
+DIMENSIONS = (YEAR, VILLAGE, *RAKE_COLUMNS)
+QUESTIONS = tuple(spec["column"] for spec in TABLES.values())
+
+_cubes = {}
+_lock = threading.Lock()
+crosstab_cache = LRUCache(max_bytes=16 * 2**20)
+
+
+class Cube:
+    """Dense counts per question over DIMENSIONS; see the module docstring."""
+
+    def __init__(self, labels, categories, counts, respondents, version=None):
+        self.version = version
+        self.labels = labels
+        self.categories = categories
+        self.counts = counts
+        self.respondents = respondents
+        self._codes = {dim: {label: code for code, label in enumerate(values)} for dim, values in labels.items()}
+        self._weighted = {}
+        self._lock = threading.Lock()
+
+    @property
+    def questions(self):
+        return list(self.counts)
+
+    def weights(self, margins):
+        """Raking weight per (year, gender, age_band), shaped to broadcast over a question's counts."""
+        # Weights are fitted on respondents summed over villages, as SurveyCounts does
+        per_cell = self.respondents.sum(axis=DIMENSIONS.index(VILLAGE))
+        index = pd.MultiIndex.from_product([self.labels[YEAR], *(self.labels[c] for c in RAKE_COLUMNS)])
+        series = pd.Series(per_cell.ravel(), index=index)
+        weights = cell_weights(series[series > 0], margins).reindex(index).fillna(1.0)
+        weights = weights.to_numpy().reshape(per_cell.shape)
+        return np.expand_dims(weights, (DIMENSIONS.index(VILLAGE), len(DIMENSIONS)))
+
+    def array(self, question, weighted=True):
+        margins = load_margins() if weighted else None
+        if margins is None:
+            return self.counts[question]
+        key = (question, margins_version(margins))
+        array = self._weighted.get(key)
+        if array is None:
+            array = self.counts[question] * self.weights(margins)
+            with self._lock:
+                self._weighted[key] = array
+        return array
+
+    def crosstab(self, question, by=None, filters=None, weighted=True):
+        """Counts of `question`'s answers (columns) per label of dimension `by` (rows), or a Series when by is None."""
+        array = self.array(question, weighted)
+        labels = dict(self.labels)
+        for axis, dim in enumerate(DIMENSIONS):
+            values = (filters or {}).get(dim)
+            if not values:
+                continue
+            values = [values] if isinstance(values, str) else values
+            codes = [self._codes[dim][str(v)] for v in values if str(v) in self._codes[dim]]
+            array = np.take(array, codes, axis=axis)
+            labels[dim] = [self.labels[dim][code] for code in codes]
+        if by is None:
+            return pd.Series(array.sum(axis=tuple(range(len(DIMENSIONS)))), index=self.categories[question])
+        axis = DIMENSIONS.index(by)
+        others = tuple(i for i in range(len(DIMENSIONS)) if i != axis)
+        return pd.DataFrame(array.sum(axis=others), index=pd.Index(labels[by], name=by),
+                            columns=pd.Index(self.categories[question], name=question))
+
+    def save(self, path):
+        arrays = {f"counts.{question}": array for question, array in self.counts.items()}
+        meta = {"format": CUBE_FORMAT, "labels": self.labels, "categories": self.categories}
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, meta=np.array(json.dumps(meta)), respondents=self.respondents, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, version=None):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["format"] != CUBE_FORMAT:
+                return None
+            counts = {question: data[f"counts.{question}"] for question in meta["categories"]}
+            return cls(meta["labels"], meta["categories"], counts, data["respondents"], version)
+
+
+def source_chunks():
+    """pandas chunks of the survey microdata, or None when only the hardcoded tables exist."""
+    columns = [*DIMENSIONS, *QUESTIONS]
+    store_path = os.environ.get("ALKOD_SURVEY_STORE")
+    if store_path:
+        from survey_store import SurveyStore
+
+        return SurveyStore(store_path).scan(columns)
+    survey_path = os.environ.get("ALKOD_SURVEY_PATH")
+    if survey_path:
+        return iter_chunks(survey_path, columns=columns)
+    return None
+
+
+def source_version():
+    store_path = os.environ.get("ALKOD_SURVEY_STORE")
+    if store_path:
+        from survey_store import SurveyStore
+
+        files = SurveyStore(store_path).dataset().files
+    else:
+        files = survey_files(os.environ.get("ALKOD_SURVEY_PATH", ""))
+    digest = hashlib.sha1(str(CUBE_FORMAT).encode())
+    for filename in sorted(files):
+        stat = os.stat(filename)
+        digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+class CubeBuilder:
+    """Accumulates chunk counts straight into dense arrays, growing an axis when a new label appears."""
+
+    def __init__(self):
+        self.labels = {dim: [] for dim in DIMENSIONS}
+        self.categories = {}
+        self.counts = {}
+        self.respondents = None
+        self._codes = {}
+
+    def codes(self, key, values):
+        # Chunk-local categorical codes -> codes into the cube's labels for `key`
+        labels = self.labels[key] if key in self.labels else self.categories.setdefault(key, [])
+        known = self._codes.setdefault(key, {})
+        mapping = np.array([known.setdefault(str(c), len(known)) for c in values.categories] or [0], dtype=np.int64)
+        labels.extend(list(known)[len(labels):])
+        codes = np.asarray(values.codes, dtype=np.int64)
+        return np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1)
+
+    def shape(self, keys):
+        return tuple(len(self.labels[k]) if k in self.labels else len(self.categories[k]) for k in keys)
+
+    def add(self, array, keys, codes):
+        shape = self.shape(keys)
+        array = np.zeros(shape, dtype=np.int64) if array is None else pad(array, shape)
+        valid = np.logical_and.reduce([c >= 0 for c in codes])
+        flat = np.ravel_multi_index([c[valid] for c in codes], shape)
+        array += np.bincount(flat, minlength=array.size).reshape(shape)
+        return array
+
+    def add_chunk(self, chunk):
+        dims = [self.codes(YEAR, year_categorical(chunk))]
+        dims += [self.codes(dim, cell_categorical(chunk, dim)) for dim in DIMENSIONS[1:]]
+        self.respondents = self.add(self.respondents, DIMENSIONS, dims)
+        for question in QUESTIONS:
+            if question in chunk:
+                answers = self.codes(question, as_categorical(chunk[question]))
+                self.counts[question] = self.add(self.counts.get(question), (*DIMENSIONS, question),
+                                                 [*dims, answers])
+
+    def cube(self, version=None):
+        if self.respondents is None:
+            return None
+        # Pad every array to the final label counts and put each axis's labels in sorted order
+        orders = [np.argsort(self.labels[dim], kind="stable") for dim in DIMENSIONS]
+        respondents = pad(self.respondents, self.shape(DIMENSIONS))[np.ix_(*orders)]
+        counts = {
+            question: pad(array, self.shape((*DIMENSIONS, question)))[
+                np.ix_(*orders, np.argsort(self.categories[question], kind="stable"))]
+            for question, array in self.counts.items()
+        }
+        labels = {dim: sorted(values) for dim, values in self.labels.items()}
+        categories = {question: sorted(self.categories[question]) for question in self.counts}
+        return Cube(labels, categories, counts, respondents, version)
+
+
+def pad(array, shape):
+    if array.shape == shape:
+        return array
+    return np.pad(array, [(0, new - old) for old, new in zip(array.shape, shape)])
+
+
+def build_cube(chunks, version=None):
+    builder = CubeBuilder()
+    for chunk in chunks:
+        builder.add_chunk(chunk)
+    return builder.cube(version)
+
+
+def configured():
+    return bool(os.environ.get("ALKOD_SURVEY_STORE") or os.environ.get("ALKOD_SURVEY_PATH"))
+
+
+def load_cube():
+    """The cube for the configured survey source, built or loaded once per source version; None without one."""
+    if not configured():
+        return None
+    version = source_version()
+    cube = _cubes.get(version)
+    if cube is not None:
+        return cube
+    with _lock:
+        cube = _cubes.get(version)
+        if cube is None:
+            path = os.path.join(CUBE_DIR, f"{version}.npz")
+            cube = Cube.load(path, version) if os.path.exists(path) else None
+            if cube is None:
+                cube = build_cube(source_chunks(), version)
+                if cube is not None:
+                    os.makedirs(CUBE_DIR, exist_ok=True)
+                    cube.save(path)
+            _cubes.clear()
+            _cubes[version] = cube
+    return cube
+
+
+def question_titles():
+    """Raw question column -> the title of the chart that shows it."""
+    titles = {spec['data']: spec['title'] for spec in FIGURE_SPECS.values()}
+    return {spec["column"]: titles.get(name, name) for name, spec in TABLES.items()}
+
+
+def crosstab_figure(cube, question, by, filters=None, by_label=None):
+    """Plain-dict grouped bar chart of `question`'s answer shares within each `by` group."""
+    # The query is cheap; building and serializing the figure is not, so figures are cached
+    key = ("crosstab", cube.version, question, by, by_label, normalize_filters(filters or {}),
+           margins_version(load_margins()), template_version())
+
+    def build():
+        return serialize(build_crosstab_figure(cube, question, by, filters, by_label))
+
+    def compute():
+        data = shared_cache.get_or_compute(key, build, bytes, bytes)
+        return json.loads(data), len(data)
+
+    return crosstab_cache.get_or_compute(key, compute, lambda entry: entry[1])[0]
+
+
+def build_crosstab_figure(cube, question, by, filters, by_label):
+    table = cube.crosstab(question, by, filters)
+    shares = 100 * table.div(table.sum(axis=1), axis=0)
+    by_label = by_label or by
+    frame = (shares.dropna().round(1).rename_axis(index=by_label, columns="Answer")
+             .stack().rename("Percentage").reset_index())
+    spec = dict(kind='bar', data=None, x=by_label, y="Percentage", color="Answer", barmode="group",
+                title=f"{question_titles()[question]} by {by_label}", colors='qualitative.Plotly')
+    return build_figure(spec, frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-tab a survey question from the precomputed cube")
+    parser.add_argument("question", choices=QUESTIONS)
+    parser.add_argument("by", choices=DIMENSIONS)
+    for dim in DIMENSIONS:
+        parser.add_argument(f"--{dim}", action="append", help=f"keep only these {dim} values")
+    parser.add_argument("--unweighted", action="store_true")
+    args = parser.parse_args()
+    cube = load_cube()
+    if cube is None:
+        raise SystemExit("No survey microdata: set ALKOD_SURVEY_STORE or ALKOD_SURVEY_PATH")
+    filters = {dim: getattr(args, dim) for dim in DIMENSIONS if getattr(args, dim)}
+    start = time.perf_counter()
+    table = cube.crosstab(args.question, args.by, filters, weighted=not args.unweighted)
+    elapsed = time.perf_counter() - start
+    print(table.round(1).to_string())
+    print(f"\n{elapsed * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Survey datasets shared by all dashboard entry points.
+
+The tables below are the defaults. A table saved as <name>.csv in
+ALKOD_DATA_DIR replaces the one of that name, so numbers can be updated
+without touching code; `python datasets.py DIR` writes the defaults there to
+start from. The running server picks up changes without a restart (see
+snapshot.py).
+"""
+import glob
+import os
+import sys
+
+import pandas as pd
+
+# Create all datasets
+data_gender_age = pd.DataFrame({
+    "Category": ["Female", "Male", "Age 46-60", "Age 30-45", "Other"],
+    "Percentage": [50, 40, 60, 30, 10]
+})
+
+data_water_availability = pd.DataFrame({
+    "Year": ["2021", "2021", "2024", "2024"],
+    "Category": ["Shortages", "Improved", "Shortages", "Improved"],
+    "Respondents": [55, 20, 15, 60]
+})
+
+data_agri_water = pd.DataFrame({
+    "Year": ["2021", "2024"],
+    "Shortages": [80, 20],
+    "Improved": [20, 80]
+})
+
+data_irrigation = pd.DataFrame({
+    "Practice": ["Improved", "No Change", "Others"],
+    "Percentage": [60, 25, 15]
+})
+
+data_crop_types = pd.DataFrame({
+    "Year": ["2021", "2024", "2021", "2024"],
+    "Crop": ["Mixed Cropping", "Mixed Cropping", "Cotton", "Cotton"],
+    "Percentage": [45, 55, 55, 45]
+})
+
+data_yield_changes = pd.DataFrame({
+    "Category": ["10-20%", "20-30%", ">30%"],
+    "Percentage": [40, 35, 25]
+})
+
+data_income = pd.DataFrame({
+    "Year": ["2021", "2024"],
+    "Low": [70, 40],
+    "Moderate": [20, 40],
+    "Significant": [10, 20]
+})
+
+data_economic = pd.DataFrame({
+    "Activity": ["New Businesses", "No Change"],
+    "Percentage": [40, 60]
+})
+
+data_employment = pd.DataFrame({
+    "Activity": ["Fewer Jobs", "Same Jobs", "More Jobs"],
+    "Percentage": [10, 30, 60]
+})
+
+data_wellbeing = pd.DataFrame({
+    "Year": ["2021", "2024"],
+    "Poor": [50, 15],
+    "Better": [30, 55],
+    "Much Better": [20, 30]
+})
+
+data_community = pd.DataFrame({
+    "Improvement": ["Access to Water", "Crop Productivity", "Others"],
+    "Percentage": [55, 35, 10]
+})
+
+data_benefits = pd.DataFrame({
+    "Category": ["Increased Productivity", "Others"],
+    "Percentage": [75, 25]
+})
+
+data_suggestions = pd.DataFrame({
+    "Suggestion": ["Storage of Water", "Maintain Lake", "Others", "New Initiatives"],
+    "Frequency": [40, 30, 20, 10]
+})
+
+# Datasets by name, as referenced from the figure registry
+DATASETS = {
+    "gender_age": data_gender_age,
+    "water_availability": data_water_availability,
+    "agri_water": data_agri_water,
+    "irrigation": data_irrigation,
+    "crop_types": data_crop_types,
+    "yield_changes": data_yield_changes,
+    "income": data_income,
+    "economic": data_economic,
+    "employment": data_employment,
+    "wellbeing": data_wellbeing,
+    "community": data_community,
+    "benefits": data_benefits,
+    "suggestions": data_suggestions,
+}
+
+
+def read_data_dir(path):
+    """Tables saved as <name>.csv under `path`, by name."""
+    datasets = {}
+    for filename in sorted(glob.glob(os.path.join(path, "*.csv"))):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        # Labels such as years stay text, as in the tables above
+        default = DATASETS.get(name)
+        text = ["Year"] if default is None else [
+            column for column in default.columns if not pd.api.types.is_numeric_dtype(default[column])]
+        datasets[name] = pd.read_csv(filename, dtype={column: str for column in text})
+    return datasets
+
+
+def write_data_dir(path, datasets=DATASETS):
+    os.makedirs(path, exist_ok=True)
+    for name, frame in datasets.items():
+        frame.to_csv(os.path.join(path, f"{name}.csv"), index=False)
+
+
+def read_datasets(survey_path=None):
+    """Datasets aggregated from survey responses when a survey source is configured.
+
+    ALKOD_SURVEY_STORE points at a columnar SurveyStore and ALKOD_SURVEY_PATH
+    at raw survey files. A directory of raw files is treated as a series of
+    batches kept in an incremental AggregateStore, so only new or changed files
+    are counted.
+    With ALKOD_MARGINS set, survey shares are weighted to census margins
+    (see weighting.py).
+    Tables the survey does not cover come from ALKOD_DATA_DIR, then from the
+    hardcoded ones above.
+    """
+    data_dir = os.environ.get("ALKOD_DATA_DIR")
+    defaults = {**DATASETS, **read_data_dir(data_dir)} if data_dir else DATASETS
+    store_path = os.environ.get("ALKOD_SURVEY_STORE")
+    if store_path and not survey_path:
+        from survey_store import SurveyStore
+
+        return {**defaults, **SurveyStore(store_path).counts().tables()}
+    survey_path = survey_path or os.environ.get("ALKOD_SURVEY_PATH")
+    if not survey_path:
+        return defaults
+    if os.path.isdir(survey_path):
+        from aggregate_store import AggregateStore
+
+        store = AggregateStore(os.environ.get("ALKOD_AGGREGATE_DIR", os.path.join(survey_path, ".aggregates")))
+        store.sync(survey_path)
+        return {**defaults, **store.tables()}
+    from survey_loader import load_survey
+
+    return {**defaults, **load_survey(survey_path)}
+
+
+def load_datasets():
+    """The datasets of the snapshot the current request is served from (see snapshot.py)."""
+    from snapshot import snapshot
+
+    return snapshot().datasets
+
+
+if __name__ == "__main__":
+    write_data_dir(sys.argv[1])
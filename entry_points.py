@@ -0,0 +1,31 @@
+"""Load the dashboard entry points as modules by name."""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Entry point name -> script; the script names are not importable as modules
+ENTRY_POINTS = {
+    "app5.4": "app5.4.py",
+    "main_version1": "main_version1.py",
+    "main_version2": "main version 2.py",
+}
+
+
+def load_entry_point(name):
+    module_name = "alkod_" + name.replace(".", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, ENTRY_POINTS[name]))
+    module = importlib.util.module_from_spec(spec)
+    # Dash resolves the assets folder through sys.modules[__name__]
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
@@ -0,0 +1,278 @@
+"""Render a dashboard to a self-contained static site.
+
+    python export_static.py main_version2 --out site [--mode inline|split]
+
+The entry point's layout is walked once with every figure pre-rendered, and
+written out as plain HTML plus plotly.js; no Python process is needed to serve
+it. The template the figures share is embedded once in index.html. In
+"inline" mode all figure JSON is embedded there too; in "split" mode each
+section's figures go to figures/<section>.json and are fetched when the
+section scrolls into view. A size report (raw and gzip bytes per file) is
+printed and written to size-report.json. That file also marks the directory
+as an export: a later export only replaces a directory that has one, and
+refuses any other non-empty directory.
+"""
+import argparse
+import gzip
+import html as html_escape
+import json
+import os
+import re
+import shutil
+
+from plotly.io.json import to_json_plotly
+
+from asset_pipeline import BUILD_DIR, ROUTE
+from entry_points import load_entry_point
+from plotly_bundle import FULL_BUNDLE, partial_bundle
+from payload import hoist_template
+
+# app5.4 only shows figures in response to callbacks, so it has no static form
+EXPORTABLE = ("main_version1", "main_version2")
+REPORT = "size-report.json"
+
+# Void HTML elements never get a closing tag
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link"}
+
+CAMEL_CASE = re.compile(r"([A-Z])")
+
+# dash_bootstrap_components -> (tag, classes) for the components the dashboards use
+BOOTSTRAP_TAGS = {
+    "Row": ("div", "row"),
+    "Card": ("div", "card"),
+    "CardBody": ("div", "card-body"),
+    "NavLink": ("a", "nav-link"),
+}
+
+RENDER_JS = """
+(function () {
+    function draw(el, fig) {
+        var layout = Object.assign({template: window.ALKOD_TEMPLATE}, fig.layout);
+        Plotly.newPlot(el, fig.data, layout, {responsive: true});
+    }
+    var graphs = document.querySelectorAll('.static-graph');
+    if (window.ALKOD_FIGURES) {
+        graphs.forEach(function (el) { draw(el, window.ALKOD_FIGURES[el.dataset.figure]); });
+        return;
+    }
+    var sections = {};
+    function load(section) {
+        if (!sections[section]) {
+            sections[section] = fetch('figures/' + section + '.json').then(function (r) { return r.json(); });
+        }
+        return sections[section];
+    }
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (!entry.isIntersecting) { return; }
+            var el = entry.target;
+            observer.unobserve(el);
+            load(el.dataset.section).then(function (figures) { draw(el, figures[el.dataset.figure]); });
+        });
+    }, {rootMargin: '200px'});
+    graphs.forEach(function (el) { observer.observe(el); });
+})();
+"""
+
+
+class StaticRenderer:
+    def __init__(self):
+        self.figures = {}
+        self.sections = {}
+
+    def render(self, node, section="main"):
+        if node is None or isinstance(node, bool):
+            return ""
+        if isinstance(node, (str, int, float)):
+            return html_escape.escape(str(node))
+        if isinstance(node, (list, tuple)):
+            return "".join(self.render(child, section) for child in node)
+
+        component = node.to_plotly_json()
+        namespace, kind, props = component["namespace"], component["type"], dict(component["props"])
+        children = props.pop("children", None)
+
+        if namespace == "dash_core_components":
+            if kind == "Graph":
+                return self.graph(props, section)
+            # Location, Store and other non-visual components have no static equivalent
+            return ""
+
+        classes = [props.pop("className", None)]
+        if namespace == "dash_html_components":
+            tag = kind.lower()
+        elif kind == "Col":
+            tag = "div"
+            classes.insert(0, column_classes(props))
+        elif kind == "Nav":
+            tag = "nav"
+            classes.insert(0, "nav" + (" flex-column" if props.get("vertical") else "")
+                           + (" nav-pills" if props.get("pills") else ""))
+        else:
+            tag, bootstrap_class = BOOTSTRAP_TAGS.get(kind, ("div", ""))
+            classes.insert(0, bootstrap_class)
+
+        class_names = " ".join(c for c in classes if c)
+        if "section" in class_names.split():
+            section = props.get("data-section") or props.get("id") or f"section{len(self.sections)}"
+        elif kind == "Row" and section == "main":
+            section = f"row{len(self.sections)}"
+
+        attributes = {
+            "id": props.get("id"),
+            "class": class_names or None,
+            "style": style_string(props.get("style")),
+            "href": props.get("href"),
+        }
+        attributes.update({k: v for k, v in props.items() if k.startswith("data-")})
+        opening = tag + "".join(
+            f' {name}="{html_escape.escape(str(value))}"' for name, value in attributes.items() if value
+        )
+        if tag in VOID_TAGS:
+            return f"<{opening}>"
+        return f"<{opening}>{self.render(children, section)}</{tag}>"
+
+    def graph(self, props, section):
+        key = f"figure{len(self.figures)}"
+        self.figures[key] = json.loads(to_json_plotly(props.get("figure") or {}))
+        self.sections.setdefault(section, []).append(key)
+        return (f'<div class="static-graph" data-figure="{key}" data-section="{section}" '
+                f'style="min-height: 300px"></div>')
+
+
+def column_classes(props):
+    classes = []
+    if props.get("width"):
+        classes.append(f"col-{props['width']}")
+    for size in ("xs", "sm", "md", "lg", "xl"):
+        if props.get(size):
+            classes.append(f"col-{size}-{props[size]}")
+    return " ".join(classes) or "col"
+
+
+def style_string(style):
+    if not style:
+        return None
+    # Dash accepts camelCase style keys; CSS needs them hyphenated
+    return "; ".join(f"{CAMEL_CASE.sub(hyphenate, key).lower()}: {value}" for key, value in style.items())
+
+
+def hyphenate(match):
+    return "-" + match.group(1)
+
+
+def page_layout(module):
+    app = module.app
+    layout = app.layout() if callable(app.layout) else app.layout
+    if hasattr(module, "build_section"):
+        # Lazily rendered sections: fill every placeholder with its built content
+        bodies = {f"{key}-body": module.build_section(key) for key in module.sections}
+        fill_placeholders(layout, bodies)
+    return layout
+
+
+def fill_placeholders(node, bodies):
+    if isinstance(node, (list, tuple)):
+        for child in node:
+            fill_placeholders(child, bodies)
+        return
+    if not hasattr(node, "to_plotly_json"):
+        return
+    if getattr(node, "id", None) in bodies:
+        node.children = bodies[node.id]
+        node.className = "section-body"
+    fill_placeholders(getattr(node, "children", None), bodies)
+
+
+def clear_output(out):
+    """Remove a previous export from `out`; never anything else."""
+    if not os.path.isdir(out) or not os.listdir(out):
+        return
+    if not os.path.isfile(os.path.join(out, REPORT)):
+        raise FileExistsError(f"{out} is not empty and holds no previous export ({REPORT}); "
+                              f"choose an empty or new directory")
+    shutil.rmtree(out)
+
+
+def export(entry_point, out, mode="inline"):
+    clear_output(out)
+    module = load_entry_point(entry_point)
+    app = module.app
+    renderer = StaticRenderer()
+    body = renderer.render(page_layout(module))
+
+    os.makedirs(os.path.join(out, "assets"), exist_ok=True)
+    shutil.copy(partial_bundle() or FULL_BUNDLE, os.path.join(out, "plotly.min.js"))
+
+    stylesheets = []
+    for stylesheet in app.config.external_stylesheets:
+        href = stylesheet if isinstance(stylesheet, str) else stylesheet["href"]
+        if href.startswith(ROUTE):
+            # Local bundle: ship the file itself rather than a server route
+            name = href[len(ROUTE):]
+            shutil.copy(os.path.join(BUILD_DIR, name), os.path.join(out, "assets", name))
+            href = f"assets/{name}"
+        stylesheets.append(href)
+
+    template, figures = hoist_template(renderer.figures)
+    figure_script = f"<script>window.ALKOD_TEMPLATE = {json.dumps(template, separators=(',', ':'))};</script>"
+    if mode == "inline":
+        figure_script += f"<script>window.ALKOD_FIGURES = {json.dumps(figures, separators=(',', ':'))};</script>"
+    else:
+        os.makedirs(os.path.join(out, "figures"))
+        for section, keys in renderer.sections.items():
+            with open(os.path.join(out, "figures", f"{section}.json"), "w") as f:
+                json.dump({key: figures[key] for key in keys}, f, separators=(",", ":"))
+
+    page = app.index_string
+    replacements = {
+        "{%metas%}": '<meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1">',
+        "{%favicon%}": "",
+        "{%css%}": "".join(f'<link rel="stylesheet" href="{href}">' for href in stylesheets),
+        "{%app_entry%}": body,
+        "{%config%}": "",
+        "{%scripts%}": f'<script src="plotly.min.js"></script>{figure_script}',
+        "{%renderer%}": f"<script>{RENDER_JS}</script>",
+    }
+    for placeholder, value in replacements.items():
+        page = page.replace(placeholder, value)
+    with open(os.path.join(out, "index.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+    return size_report(out)
+
+
+def size_report(out):
+    report = {}
+    for directory, _, files in os.walk(out):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if name == REPORT:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            report[os.path.relpath(path, out)] = {"bytes": len(data), "gzip_bytes": len(gzip.compress(data))}
+    with open(os.path.join(out, REPORT), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a dashboard as a static site")
+    parser.add_argument("entry_point", nargs="?", default="main_version2", choices=EXPORTABLE)
+    parser.add_argument("--out", default="site")
+    parser.add_argument("--mode", choices=("inline", "split"), default="inline")
+    args = parser.parse_args()
+
+    try:
+        report = export(args.entry_point, args.out, args.mode)
+    except FileExistsError as exc:
+        parser.error(str(exc))
+    print(f"{'file':<40}{'bytes':>12}{'gzip bytes':>12}")
+    for name, sizes in sorted(report.items()):
+        print(f"{name:<40}{sizes['bytes']:>12}{sizes['gzip_bytes']:>12}")
+    print(f"{'total':<40}{sum(s['bytes'] for s in report.values()):>12}"
+          f"{sum(s['gzip_bytes'] for s in report.values()):>12}")
+
+
+if __name__ == "__main__":
+    main()
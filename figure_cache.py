@@ -0,0 +1,168 @@
+"""Pre-serialized figure cache.
+
+Each figure is serialized to compact JSON once, keyed by a hash of its source
+DataFrame and styling, and callbacks are served from the cached copy instead
+of re-validating and re-serializing a live go.Figure on every click.
+
+Serialized figures are also kept process-wide by key, so a cache built for
+new data (see snapshot.py) only rebuilds the figures whose source changed.
+Under those, the shared cache (shared_cache.py) holds them for every worker
+and across restarts; keys only depend on content, so an entry never goes stale.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+import metrics
+from payload import optimize_figure
+from result_cache import LRUCache, SingleFlight
+from shared_cache import shared
+
+# Bump when the serialized format changes so stale shared entries are ignored
+CACHE_FORMAT = 2
+
+serialized = LRUCache(max_bytes=int(os.environ.get("ALKOD_FIGURE_MEMORY_MB", 32)) * 2**20)
+# Concurrent requests for a figure nobody has built yet build it once, across all caches
+building = SingleFlight()
+
+
+# frame_hash results by id() of the frame, dropped when the frame is collected
+_frame_hashes = {}
+
+
+def frame_hash(frame):
+    """Content hash of a DataFrame: its column names, dtypes, index and column buffers.
+
+    Loaded datasets are never modified in place, so the hash is computed once
+    per frame object and remembered for as long as the frame lives.
+    """
+    key = id(frame)
+    cached = _frame_hashes.get(key)
+    if cached is not None:
+        return cached
+    # Hash values, index and column names so relabelled frames get new keys
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps([str(c) for c in frame.columns]).encode())
+    update_array_hash(digest, frame.index)
+    for i in range(frame.shape[1]):
+        update_array_hash(digest, frame.iloc[:, i])
+    cached = _frame_hashes[key] = digest.hexdigest()
+    weakref.finalize(frame, _frame_hashes.pop, key, None)
+    return cached
+
+
+def update_array_hash(digest, values):
+    dtype = values.dtype
+    digest.update(str(dtype).encode())
+    if isinstance(values, pd.RangeIndex):
+        digest.update(f"{values.start}:{values.stop}:{values.step}".encode())
+    elif isinstance(dtype, pd.CategoricalDtype):
+        categorical = values.array
+        update_array_hash(digest, categorical.categories)
+        digest.update(np.ascontiguousarray(categorical.codes))
+    elif isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+        # Numbers are hashed straight from their buffer, without a copy
+        digest.update(np.ascontiguousarray(values.to_numpy()))
+    else:
+        # Strings and other objects: one vectorized hash per value
+        digest.update(pd.util.hash_array(np.asarray(values, dtype=object)))
+
+
+class FigureCache:
+    def __init__(self, store=shared):
+        self.store = store
+        self._keys = {}
+        self._builders = {}
+        self._bytes = {}
+        self._dicts = {}
+        self._lock = threading.Lock()
+
+    def key(self, name, source, style):
+        digest = hashlib.sha1()
+        digest.update(f"{CACHE_FORMAT}:{plotly.__version__}:{name}".encode())
+        digest.update(frame_hash(source).encode())
+        digest.update(json.dumps(style, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def from_registry(cls, registry, store=shared):
+        cache = cls(store)
+        for name in registry:
+            cache.add(name, registry.source(name), registry.style(name), lambda name=name: registry[name])
+        return cache
+
+    def add(self, name, source, style, build):
+        """Register figure `name`; `build` is only called on first use and a cache miss."""
+        key = self.key(name, source, style)
+        with self._lock:
+            if self._keys.get(name) != key:
+                self._keys[name] = key
+                self._builders[name] = build
+                self._bytes.pop(name, None)
+                self._dicts.pop(name, None)
+        return key
+
+    def get_bytes(self, name):
+        data = self._bytes.get(name)
+        if data is None:
+            key = self._keys[name]
+            data = building.do(key, lambda: self._load(name, key))
+            with self._lock:
+                if self._keys[name] == key:
+                    self._bytes[name] = data
+        return data
+
+    def _load(self, name, key):
+        data = self._read(key)
+        if data is None:
+            fig = self._builders[name]()
+            start = time.perf_counter()
+            data = serialize(fig)
+            metrics.observe("alkod_figure_serialize_seconds", {"figure": name}, time.perf_counter() - start)
+            self._write(key, data)
+        return data
+
+    def get(self, name):
+        # Decode once; Dash re-encodes a plain dict far cheaper than a go.Figure
+        fig = self._dicts.get(name)
+        if fig is None:
+            fig = json.loads(self.get_bytes(name))
+            with self._lock:
+                self._dicts[name] = fig
+        return fig
+
+    def warm(self):
+        """Build and serialize every figure now rather than on first request."""
+        for name in self.names():
+            self.get(name)
+
+    def __contains__(self, name):
+        return name in self._keys
+
+    def names(self):
+        return list(self._keys)
+
+    def _read(self, key):
+        data = serialized.get(key)
+        if data is not None or self.store is None:
+            return data
+        data = self.store.get(("figure", key))
+        return serialized.set(key, data, len(data)) if data is not None else None
+
+    def _write(self, key, data):
+        serialized.set(key, data, len(data))
+        if self.store is not None:
+            self.store.set(("figure", key), data)
+
+
+def serialize(fig):
+    data = pio.to_json(fig, validate=False, pretty=False, remove_uids=True)
+    return json.dumps(optimize_figure(json.loads(data)), separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,222 @@
+"""Declarative figure registry shared by all dashboard entry points.
+
+Every chart is declared once in FIGURE_SPECS and styled through the "alkod"
+Plotly template. Figures are built on first access and memoized. Bar charts
+get bootstrap confidence intervals (see bootstrap.py) as error bars.
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections.abc import Mapping
+
+import bootstrap
+from datasets import load_datasets
+
+TEMPLATE_NAME = "alkod"
+CHART_HEIGHT = 300
+BORDER_COLOR = "rgba(0,0,0,0.1)"
+BG_COLOR = "white"
+TEXT_COLOR = "rgba(0,0,0,0.7)"
+
+PIE_MARGIN = dict(l=20, r=20, t=40, b=20)
+
+# The "alkod" template: these settings on top of Plotly's "plotly" template
+TEMPLATE = dict(
+    layout=dict(
+        paper_bgcolor=BG_COLOR,
+        plot_bgcolor=BG_COLOR,
+        title_font=dict(size=18, color=TEXT_COLOR),
+        margin=dict(l=30, r=30, t=40, b=30),
+        showlegend=True,
+        legend_title_font=dict(size=12, color=TEXT_COLOR),
+        font=dict(size=14, color=TEXT_COLOR),
+    ),
+    data=dict(
+        bar=[dict(marker=dict(line=dict(color=BORDER_COLOR, width=1)))],
+        pie=[dict(marker=dict(line=dict(color=BORDER_COLOR, width=1)))],
+        scatter=[dict(line=dict(width=2))],
+    ),
+)
+
+# One entry per chart: "kind" is the plotly.express function, "data" the dataset
+# name, "melt" optional wide-to-long arguments, "colors" a px.colors palette,
+# "layout" per-chart layout overrides and "traces" per-chart trace updates;
+# every other key is passed to px as is.
+FIGURE_SPECS = {
+    'demographics': dict(
+        kind='pie', data='gender_age', names='Category', values='Percentage',
+        title="Demographics Overview", colors='sequential.RdBu',
+        layout=dict(legend_title_text="Categories", margin=dict(PIE_MARGIN, pad=10)),
+    ),
+    'water_availability': dict(
+        kind='bar', data='water_availability', x="Category", y="Respondents",
+        color="Year", barmode="group", title="Water Availability Changes",
+        colors='qualitative.Set1',
+    ),
+    'agri_water': dict(
+        kind='line', data='agri_water',
+        melt=dict(id_vars="Year", var_name="Condition", value_name="Percentage"),
+        x="Year", y="Percentage", color="Condition", title="Agricultural Water Availability",
+        colors='qualitative.Dark2', traces=dict(line=dict(width=2, color=BORDER_COLOR)),
+    ),
+    'irrigation': dict(
+        kind='bar', data='irrigation', x="Practice", y="Percentage",
+        title="Change in Irrigation Practices", colors='sequential.Viridis',
+    ),
+    'crop_types': dict(
+        kind='bar', data='crop_types', x="Crop", y="Percentage", color="Year", barmode="group",
+        title="Crop Types (2021 vs. 2024)", colors='qualitative.Plotly',
+    ),
+    'yield_changes': dict(
+        kind='bar', data='yield_changes', x="Category", y="Percentage", orientation="h",
+        title="Yield Changes", colors='sequential.Blues',
+        layout=dict(xaxis_title="Percentage", yaxis_title="Category"),
+    ),
+    'income': dict(
+        kind='area', data='income',
+        melt=dict(id_vars="Year", var_name="Income Level", value_name="Percentage"),
+        x="Year", y="Percentage", color="Income Level", title="Income Changes Over Time",
+        colors='sequential.Sunset', traces=dict(line=dict(width=2, color=BORDER_COLOR)),
+    ),
+    'economic': dict(
+        kind='pie', data='economic', names="Activity", values="Percentage",
+        title="Economic Activities", colors='sequential.Emrld',
+        layout=dict(legend_title_text="Economic Activities", margin=PIE_MARGIN),
+    ),
+    'employment': dict(
+        kind='bar', data='employment', x="Activity", y="Percentage",
+        title="Employment Opportunities", colors='qualitative.Set3',
+    ),
+    'wellbeing': dict(
+        kind='bar', data='wellbeing',
+        melt=dict(id_vars="Year", var_name="Rating", value_name="Percentage"),
+        x="Year", y="Percentage", color="Rating", barmode="group",
+        title="Well-being Ratings", colors='qualitative.T10',
+    ),
+    'community': dict(
+        kind='bar', data='community', x="Improvement", y="Percentage", orientation="h",
+        title="Community Benefits", colors='sequential.Mint',
+        layout=dict(xaxis_title="Percentage", yaxis_title="Improvement"),
+    ),
+    'benefits': dict(
+        kind='pie', data='benefits', names="Category", values="Percentage",
+        title="Significant Benefits", colors='qualitative.Bold',
+        layout=dict(legend_title_text="Benefits", margin=PIE_MARGIN),
+    ),
+    'suggestions': dict(
+        kind='bar', data='suggestions', x="Suggestion", y="Frequency",
+        title="Suggestions Distribution", colors='qualitative.Safe',
+    ),
+}
+
+_template_lock = threading.Lock()
+
+
+def register_template():
+    """Compile the shared template into plotly.io.templates once per process."""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    with _template_lock:
+        if TEMPLATE_NAME in pio.templates:
+            return TEMPLATE_NAME
+        template = go.layout.Template(pio.templates["plotly"])
+        template.layout.update(TEMPLATE["layout"])
+        for trace_type, traces in TEMPLATE["data"].items():
+            template.data[trace_type] = traces
+        pio.templates[TEMPLATE_NAME] = template
+    return TEMPLATE_NAME
+
+
+def template_version():
+    """Hash of the template's settings; the "plotly" base changes only with the Plotly version."""
+    return hashlib.sha1(json.dumps(TEMPLATE, sort_keys=True).encode()).hexdigest()
+
+
+def style_version(name):
+    """Hash of everything besides the data that styles figure `name`, for cache keys."""
+    style = dict(FIGURE_SPECS[name], template=template_version(), bootstrap=bootstrap.settings())
+    return hashlib.sha1(json.dumps(style, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def build_figure(spec, frame, height=CHART_HEIGHT, errors=None):
+    # Imported here so entry points only pay for plotly.express once a figure is needed
+    import plotly.express as px
+
+    spec = dict(spec)
+    kind = spec.pop('kind')
+    spec.pop('data')
+    melt = spec.pop('melt', None)
+    layout = spec.pop('layout', None)
+    traces = spec.pop('traces', None)
+    palette, name = spec.pop('colors').split('.')
+    if melt:
+        frame = frame.melt(**melt)
+    if errors is not None:
+        frame = frame.assign(error_plus=errors['plus'], error_minus=errors['minus'])
+        spec[f"error_{errors['axis']}"] = 'error_plus'
+        spec[f"error_{errors['axis']}_minus"] = 'error_minus'
+    if height is not None:
+        spec['height'] = height
+    fig = getattr(px, kind)(
+        frame, template=register_template(),
+        color_discrete_sequence=getattr(getattr(px.colors, palette), name), **spec
+    )
+    if layout:
+        fig.update_layout(**layout)
+    if traces:
+        # Explicit per-trace settings, which px's own trace styling would override in a template
+        fig.update_traces(**traces)
+    return fig
+
+
+class FigureRegistry(Mapping):
+    """Lazily built, memoized figures keyed by FIGURE_SPECS name.
+
+    `overrides` maps a figure name to spec keys to replace, e.g. a different
+    title for one entry point; `height=None` keeps Plotly's default height.
+    """
+
+    def __init__(self, datasets=None, overrides=None, height=CHART_HEIGHT):
+        self.datasets = load_datasets() if datasets is None else datasets
+        self.overrides = overrides or {}
+        self.height = height
+        self._figures = {}
+        self._intervals = None
+        self._lock = threading.Lock()
+
+    def spec(self, name):
+        spec = copy.deepcopy(FIGURE_SPECS[name])
+        spec.update(self.overrides.get(name, {}))
+        return spec
+
+    def source(self, name):
+        return self.datasets[FIGURE_SPECS[name]['data']]
+
+    def style(self, name):
+        # Everything besides the source data that determines the built figure
+        return dict(self.spec(name), height=self.height, template=template_version(),
+                    border_color=BORDER_COLOR, bg_color=BG_COLOR, text_color=TEXT_COLOR,
+                    bootstrap=bootstrap.settings(), respondents=self.source(name).attrs.get('respondents'))
+
+    def intervals(self):
+        # One resampling pass covers every chart, so it runs on the first build
+        if self._intervals is None:
+            specs = {name: self.spec(name) for name in FIGURE_SPECS}
+            self._intervals = bootstrap.bootstrap_intervals(specs, self.datasets)
+        return self._intervals
+
+    def __getitem__(self, name):
+        fig = self._figures.get(name)
+        if fig is None:
+            fig = build_figure(self.spec(name), self.source(name), self.height, self.intervals().get(name))
+            with self._lock:
+                fig = self._figures.setdefault(name, fig)
+        return fig
+
+    def __iter__(self):
+        return iter(FIGURE_SPECS)
+
+    def __len__(self):
+        return len(FIGURE_SPECS)
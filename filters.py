@@ -0,0 +1,167 @@
+"""Year/village/gender/age-band filters for the dashboards.
+
+With a SurveyStore configured (ALKOD_SURVEY_STORE) every filter re-aggregates
+the responses; otherwise only the year filter applies, to the hardcoded tables
+that have a Year column. Aggregates and the figures built from them are kept
+in a size-bounded LRU cache keyed by the normalized filters and data version
+(the content hash of the request's data snapshot, see snapshot.py). Under it,
+the shared cache (shared_cache.py) lets every worker reuse what one computed.
+"""
+import json
+import os
+import pickle
+import time
+
+import metrics
+import shared_cache
+from datasets import load_datasets
+from figure_cache import serialize
+from figure_registry import FigureRegistry, style_version
+from result_cache import LRUCache
+from snapshot import reload, snapshot
+
+FILTERS = {
+    "year": "Year",
+    "village": "Village",
+    "gender": "Gender",
+    "age_band": "Age band",
+}
+
+filter_cache = LRUCache(max_bytes=int(os.environ.get("ALKOD_FILTER_CACHE_MB", 64)) * 2**20)
+
+
+def survey_store():
+    path = os.environ.get("ALKOD_SURVEY_STORE")
+    if not path:
+        return None
+    from survey_store import SurveyStore
+
+    return SurveyStore(path)
+
+
+def normalize_filters(filters):
+    """Canonical, hashable form: sorted (column, sorted values) pairs, empty ones dropped."""
+    normalized = []
+    for column, values in sorted(filters.items()):
+        if not values:
+            continue
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        normalized.append((column, tuple(sorted(str(v) for v in values))))
+    return tuple(normalized)
+
+
+def filter_options():
+    store = survey_store()
+    if store is not None:
+        return {column: store.values(column) for column in FILTERS}
+    years = set()
+    for frame in load_datasets().values():
+        if "Year" in frame:
+            years.update(frame["Year"].astype(str))
+    return {column: sorted(years) if column == "year" else [] for column in FILTERS}
+
+
+def data_version():
+    # Content hash of the request's data snapshot; covers the store's files and the margins
+    return snapshot().version
+
+
+def filtered_datasets(filters, version=None, progress=None):
+    filters = normalize_filters(filters)
+    if not filters:
+        return load_datasets()
+    key = ("datasets", filters, version or data_version())
+
+    def compute():
+        return shared_cache.get_or_compute(key, lambda: aggregate(dict(filters), progress), pickle.dumps, pickle.loads)
+
+    return filter_cache.get_or_compute(key, compute, datasets_size)
+
+
+def aggregate(filters, progress=None):
+    store = survey_store()
+    if store is not None:
+        return {**load_datasets(), **store.counts(progress=progress, **filters).tables()}
+    years = set(filters.get("year", ()))
+    datasets = {}
+    for name, frame in load_datasets().items():
+        if years and "Year" in frame:
+            frame = frame[frame["Year"].astype(str).isin(years)].reset_index(drop=True)
+        datasets[name] = frame
+    return datasets
+
+
+def datasets_size(datasets):
+    return sum(int(frame.memory_usage(deep=True).sum()) for frame in datasets.values())
+
+
+def figure_key(name, filters, version, registry_options=None):
+    return ("figure", name, normalize_filters(filters), version, style_version(name),
+            json.dumps(registry_options or {}, sort_keys=True))
+
+
+def filtered_figure(name, filters, registry_options=None, progress=None):
+    """Plain-dict figure `name` for the given filters, served from the LRU cache when possible."""
+    filters = normalize_filters(filters)
+    version = data_version()
+
+    key = figure_key(name, dict(filters), version, registry_options)
+
+    def build():
+        datasets = filtered_datasets(dict(filters), version, progress)
+        registry = FigureRegistry(datasets=datasets, **(registry_options or {}))
+        fig = registry[name]
+        start = time.perf_counter()
+        data = serialize(fig)
+        metrics.observe("alkod_figure_serialize_seconds", {"figure": name}, time.perf_counter() - start)
+        return data
+
+    def compute():
+        data = shared_cache.get_or_compute(key, build, bytes, bytes)
+        return json.loads(data), len(data)
+
+    entry = filter_cache.get_or_compute(key, compute, lambda entry: entry[1])
+    return entry[0]
+
+
+def cached_figure(name, filters, registry_options=None):
+    """The filtered figure if this or another process already has it, else None; never aggregates."""
+    key = figure_key(name, filters, data_version(), registry_options)
+    entry = filter_cache.get(key)
+    if entry is None and shared_cache.shared is not None:
+        data = shared_cache.shared.get(key)
+        try:
+            figure = json.loads(data) if data is not None else None
+        except ValueError:
+            # Unreadable entry: a miss, overwritten once the figure is computed again
+            figure = None
+        if figure is not None:
+            entry = filter_cache.set(key, (figure, len(data)), len(data))
+    return entry[0] if entry is not None else None
+
+
+def remember_figure(name, filters, figure, registry_options=None):
+    """Cache a figure computed elsewhere, e.g. by a background job."""
+    key = figure_key(name, filters, data_version(), registry_options)
+    data = json.dumps(figure, separators=(",", ":")).encode()
+    filter_cache.set(key, (figure, len(data)), len(data))
+    if shared_cache.shared is not None:
+        shared_cache.shared.set(key, data)
+
+
+def figure_job_params(name, filters, registry_options=None):
+    # The data version is part of the parameters, so new data means a new job
+    return {"name": name, "filters": dict(normalize_filters(filters)), "version": data_version(),
+            "registry_options": registry_options}
+
+
+def filtered_figure_job(params, progress):
+    """Background job target (see jobs.py): build one filtered figure."""
+    if params["version"] != data_version():
+        # Pool processes outlive reloads in the server; catch up with it
+        reload()
+    progress(0, "Aggregating responses")
+    figure = filtered_figure(params["name"], params["filters"], params["registry_options"],
+                             progress=lambda fraction, message: progress(0.9 * fraction, message))
+    return figure
@@ -0,0 +1,213 @@
+"""Disk-backed background jobs for slow aggregations.
+
+Jobs live in a SQLite queue (ALKOD_JOB_DB, default build/jobs.sqlite), which
+every server process shares. A job is identified by a hash of its target
+function and parameters, so resubmitting identical work returns the existing
+job, and a finished result is served from disk even after a restart. Finished
+and failed jobs are deleted ALKOD_JOB_TTL seconds (default a day) after they
+last changed. The queue is created on first use (job_queue()), so processes
+that never submit work leave no database behind.
+
+Each process that submits work runs a dispatcher thread. The thread claims
+queued jobs, at most ALKOD_JOB_WORKERS running across all processes, and runs
+them in a process pool. Pandas work therefore never runs on a request thread.
+A target is a "module:function" taking (params, progress). It calls
+progress(fraction, message) as it goes and returns a JSON-serializable result.
+"""
+import concurrent.futures
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("ALKOD_JOB_DB", os.path.join(ROOT, "build", "jobs.sqlite"))
+WORKERS = int(os.environ.get("ALKOD_JOB_WORKERS", 2))
+# A job still "running" this long after its last progress report is assumed lost
+STALE_AFTER = 600
+TTL = float(os.environ.get("ALKOD_JOB_TTL", 24 * 3600))
+IDLE_WAIT = 1.0
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    target TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+def job_id(target, params):
+    return hashlib.sha1(json.dumps([target, params], sort_keys=True).encode()).hexdigest()
+
+
+class JobQueue:
+    def __init__(self, path=DB_PATH, workers=WORKERS):
+        self.path = path
+        self.workers = workers
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db().execute(SCHEMA)
+
+    def submit(self, target, params):
+        """Queue `target(params, progress)` unless identical work is queued, running or done."""
+        identifier = job_id(target, params)
+        now = time.time()
+        db = self._db()
+        db.execute(
+            "INSERT OR IGNORE INTO jobs (id, target, params, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (identifier, target, json.dumps(params), now, now),
+        )
+        # A failed job is retried when it is asked for again
+        db.execute("UPDATE jobs SET status = 'queued', progress = 0, message = '', updated = ? "
+                   "WHERE id = ? AND status = 'failed'", (now, identifier))
+        self._start_dispatcher()
+        self._wake.set()
+        return identifier
+
+    def get(self, identifier):
+        row = self._db().execute(
+            "SELECT status, progress, message, result FROM jobs WHERE id = ?", (identifier,)).fetchone()
+        if row is None:
+            return None
+        status, progress, message, result = row
+        return {"id": identifier, "status": status, "progress": progress, "message": message,
+                "result": json.loads(result) if result is not None else None}
+
+    def _db(self):
+        # sqlite3 connections may not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path)
+        return connection
+
+    def _start_dispatcher(self):
+        with self._lock:
+            # Threads and pools do not survive fork: start them in each worker process
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._executor = self._new_executor()
+            threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True).start()
+
+    def _new_executor(self):
+        context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        if context.get_start_method() == "forkserver":
+            # Workers fork from a server that has already imported what jobs need
+            context.set_forkserver_preload(["filters"])
+        return concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=context)
+
+    def _dispatch(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.OperationalError:
+                logger.exception("Cannot claim a job; retrying")
+                job = None
+            if job is None:
+                self._wake.wait(IDLE_WAIT)
+                self._wake.clear()
+                continue
+            identifier, target, params = job
+            try:
+                future = self._executor.submit(run_job, self.path, identifier, target, json.loads(params))
+            except concurrent.futures.BrokenExecutor:
+                # A pool worker died (e.g. killed for memory) and the pool takes no more work.
+                # This job never ran: queue it again for a new pool
+                logger.exception("Job pool broken; starting a new one")
+                self._db().execute("UPDATE jobs SET status = 'queued', updated = ? WHERE id = ?",
+                                   (time.time(), identifier))
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                continue
+            except Exception as exc:
+                logger.exception("Cannot start job %s", identifier)
+                self._fail(identifier, exc)
+                continue
+            future.add_done_callback(lambda future, identifier=identifier: self._finished(identifier, future))
+
+    def _claim(self):
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated < ?",
+                       (now - STALE_AFTER,))
+            db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (now - TTL,))
+            (running,) = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()
+            row = None
+            if running < self.workers:
+                row = db.execute("SELECT id, target, params FROM jobs WHERE status = 'queued' "
+                                 "ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ?", (now, row[0]))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finished(self, identifier, future):
+        # run_job records its own outcome; this only catches a crashed worker process
+        if future.exception() is not None:
+            self._fail(identifier, future.exception())
+        self._wake.set()
+
+    def _fail(self, identifier, exc):
+        self._db().execute("UPDATE jobs SET status = 'failed', message = ?, updated = ? WHERE id = ?",
+                           (repr(exc), time.time(), identifier))
+
+
+def run_job(path, identifier, target, params):
+    db = connect(path)
+
+    def progress(fraction, message=""):
+        db.execute("UPDATE jobs SET progress = ?, message = ?, updated = ? WHERE id = ?",
+                   (fraction, message, time.time(), identifier))
+
+    module, _, name = target.partition(":")
+    try:
+        result = getattr(importlib.import_module(module), name)(params, progress)
+    except Exception as exc:  # recorded for the UI; the worker process stays usable
+        db.execute("UPDATE jobs SET status = 'failed', message = ?, updated = ? WHERE id = ?",
+                   (f"{type(exc).__name__}: {exc}", time.time(), identifier))
+        return
+    db.execute("UPDATE jobs SET status = 'done', progress = 1, message = '', result = ?, updated = ? WHERE id = ?",
+               (json.dumps(result), time.time(), identifier))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def job_queue():
+    """The shared JobQueue, created on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+    return _queue
@@ -0,0 +1,103 @@
+"""Summary KPIs computed from the survey datasets.
+
+Each KPI is declared once in KPI_SPECS as the share of some categories of a
+dataset: the percentage of a year's respondents who answered one of
+`categories`, and its change in percentage points since the previous year.
+"data" is the dataset name. "label" and "value" name a long or share table's
+category and number columns; a wide table (Year plus one column per
+category) needs neither.
+
+All KPIs are evaluated together: their rows are stacked into one long frame
+and reduced with a single groupby. Results are memoized per data version, so
+the summary cards cost one computation per data change rather than one per
+page view.
+"""
+import hashlib
+import json
+
+import pandas as pd
+
+from datasets import load_datasets
+from figure_cache import frame_hash
+from result_cache import LRUCache
+
+KPI_SPECS = {
+    'water_improvement': dict(
+        title="Water Improvement", data='water_availability', label="Category", value="Respondents",
+        categories=["Improved"],
+    ),
+    'agricultural_growth': dict(
+        title="Agricultural Growth", data='agri_water', categories=["Improved"],
+    ),
+    'community_impact': dict(
+        title="Community Impact", data='wellbeing', categories=["Better", "Much Better"],
+    ),
+    'economic_growth': dict(
+        title="Economic Growth", data='income', categories=["Moderate", "Significant"],
+    ),
+}
+
+YEAR = "Year"
+
+kpi_cache = LRUCache(max_bytes=2**20)
+
+
+def long_form(spec, frame):
+    """(Year, category, value) rows of a dataset, whatever its shape."""
+    if 'label' in spec:
+        frame = frame.rename(columns={spec['label']: "category", spec['value']: "value"})
+        frame = frame[[c for c in (YEAR, "category", "value") if c in frame]]
+    else:
+        frame = frame.melt(id_vars=YEAR, var_name="category", value_name="value")
+    if YEAR not in frame:
+        frame = frame.assign(**{YEAR: ""})
+    return frame.assign(**{YEAR: frame[YEAR].astype(str)})
+
+
+def evaluate(datasets, specs=KPI_SPECS):
+    """{kpi: {"value", "change"}}: latest share in percent and its change in points (None without years)."""
+    frames = []
+    for name, spec in specs.items():
+        frame = long_form(spec, datasets[spec['data']])
+        frames.append(frame.assign(kpi=name, selected=frame["category"].astype(str).isin(spec['categories'])))
+    rows = pd.concat(frames, ignore_index=True)
+    rows["selected_value"] = rows["value"].where(rows["selected"], 0)
+
+    totals = rows.groupby(["kpi", YEAR], sort=True)[["value", "selected_value"]].sum()
+    shares = (100 * totals["selected_value"] / totals["value"]).rename("share").reset_index()
+    latest = shares.groupby("kpi").tail(2).groupby("kpi")["share"]
+    values = latest.last()
+    changes = values - latest.first()
+    counts = latest.count()
+    return {
+        name: {"value": float(values[name]), "change": float(changes[name]) if counts[name] > 1 else None}
+        for name in specs
+    }
+
+
+def kpi_version(datasets, specs=KPI_SPECS):
+    # The source tables' content hashes (memoized per table) and the declarations;
+    # nothing else affects the results
+    digest = hashlib.sha1(json.dumps(specs, sort_keys=True).encode())
+    for name in sorted({spec['data'] for spec in specs.values()}):
+        digest.update(f"{name}:{frame_hash(datasets[name])}".encode())
+    return digest.hexdigest()
+
+
+def kpis(datasets=None, specs=KPI_SPECS):
+    datasets = load_datasets() if datasets is None else datasets
+    return kpi_cache.get_or_compute(kpi_version(datasets, specs), lambda: evaluate(datasets, specs),
+                                    lambda result: 200 * len(result))
+
+
+def summary_stats(datasets=None, specs=KPI_SPECS):
+    """Summary card contents: title, value ("60%") and change ("+40 pts")."""
+    results = kpis(datasets, specs)
+    return [
+        {
+            "title": spec['title'],
+            "value": f"{results[name]['value']:.0f}%",
+            "change": "n/a" if results[name]['change'] is None else f"{results[name]['change']:+.0f} pts",
+        }
+        for name, spec in specs.items()
+    ]
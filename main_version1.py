@@ -1,253 +1,158 @@
 from dash import Dash, html, dcc
-from dash.dependencies import Input, Output
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 from flask import Flask
 import dash_bootstrap_components as dbc
 
+from asset_pipeline import dash_assets, install_bundles
+from coalesce import install_coalescing
+from compression import install_compression
+from figure_cache import FigureCache
+from figure_registry import FigureRegistry
+from kpis import summary_stats
+from metrics import instrument
+from profiling import install_profiler
+from snapshot import PerSnapshot, install_hot_reload, snapshot_cache
+
 # Initialize Flask server
 server = Flask(__name__)
 
-# Initialize Dash app with Bootstrap theme
-app = Dash(__name__, server=server, external_stylesheets=[dbc.themes.BOOTSTRAP])
-
-# Create the DataFrames
-data_gender_age = pd.DataFrame({
-    "Category": ["Female", "Male", "Age 46-60", "Age 30-45", "Other"],
-    "Percentage": [50, 40, 60, 30, 10]
-})
-
-data_water_availability = pd.DataFrame({
-    "Year": ["2021", "2021", "2024", "2024"],
-    "Category": ["Shortages", "Improved", "Shortages", "Improved"],
-    "Respondents": [55, 20, 15, 60]
-})
-
-data_agri_water = pd.DataFrame({
-    "Year": ["2021", "2024"],
-    "Shortages": [80, 20],
-    "Improved": [20, 80]
-})
-
-data_irrigation = pd.DataFrame({
-    "Practice": ["Improved", "No Change", "Others"],
-    "Percentage": [60, 25, 15]
-})
-
-data_crop_types = pd.DataFrame({
-    "Year": ["2021", "2024", "2021", "2024"],
-    "Crop": ["Mixed Cropping", "Mixed Cropping", "Cotton", "Cotton"],
-    "Percentage": [45, 55, 55, 45]
-})
-
-data_yield_changes = pd.DataFrame({
-    "Category": ["10-20%", "20-30%", ">30%"],
-    "Percentage": [40, 35, 25]
-})
-
-data_income = pd.DataFrame({
-    "Year": ["2021", "2024"],
-    "Low": [70, 40],
-    "Moderate": [20, 40],
-    "Significant": [10, 20]
-})
-
-data_economic = pd.DataFrame({
-    "Activity": ["New Businesses", "No Change"],
-    "Percentage": [40, 60]
-})
-
-data_employment = pd.DataFrame({
-    "Activity": ["Fewer Jobs", "Same Jobs", "More Jobs"],
-    "Percentage": [10, 30, 60]
-})
-
-data_wellbeing = pd.DataFrame({
-    "Year": ["2021", "2024"],
-    "Poor": [50, 15],
-    "Better": [30, 55],
-    "Much Better": [20, 30]
-})
-
-data_community = pd.DataFrame({
-    "Improvement": ["Access to Water", "Crop Productivity", "Others"],
-    "Percentage": [55, 35, 10]
-})
-
-data_benefits = pd.DataFrame({
-    "Category": ["Increased Productivity", "Others"],
-    "Percentage": [75, 25]
-})
-
-data_suggestions = pd.DataFrame({
-    "Suggestion": ["Storage of Water", "Maintain Lake", "Others", "New Initiatives"],
-    "Frequency": [40, 30, 20, 10]
-})
-
-# Create summary cards data
-def create_summary_stats():
+# Initialize Dash app with Bootstrap theme, bundled with the page styles and served locally
+app = instrument(Dash(__name__, server=server, **dash_assets("main_version1", vendored=["bootstrap"])))
+
+install_profiler(server)
+install_compression(server)
+install_bundles(server)
+install_coalescing(server)
+
+# Figures come from the shared registry; titles differ slightly on this page
+def build_figure_cache(datasets):
+    figures = FigureRegistry(datasets, height=None, overrides={
+        'irrigation': {'title': "Irrigation Practices"},
+        'wellbeing': {'title': "Well-being Ratings Over Time"},
+        'community': {'title': "Community Benefits from Lake Rejuvenation"},
+    })
+    return FigureCache.from_registry(figures)
+
+# One cache per data snapshot, so reloaded data never mixes with the old (see snapshot.py)
+figure_cache = PerSnapshot(build_figure_cache)
+
+# Sections keyed by their sidebar anchor: title and rows of (figure, column width)
+sections = {
+    "overview": ("Overview", [
+        [('demographics', 6), ('water_availability', 6)],
+    ]),
+    "water": ("Water Resources", [
+        [('agri_water', 12)],
+    ]),
+    "agriculture": ("Agriculture", [
+        [('irrigation', 6), ('crop_types', 6)],
+        [('yield_changes', 12)],
+    ]),
+    "economic": ("Economic Impact", [
+        [('income', 12)],
+        [('economic', 6), ('employment', 6)],
+    ]),
+    "community": ("Community Impact", [
+        [('wellbeing', 12)],
+        [('community', 6), ('benefits', 6)],
+    ]),
+    "feedback": ("Feedback & Suggestions", [
+        [('suggestions', 12)],
+    ]),
+}
+
+# Each section is only built when first requested and then reused until the data changes
+@snapshot_cache
+def build_section(key):
     return [
-        {"title": "Water Improvement", "value": "60%", "change": "+40%"},
-        {"title": "Agricultural Growth", "value": "55%", "change": "+25%"},
-        {"title": "Community Impact", "value": "75%", "change": "+45%"},
-        {"title": "Economic Growth", "value": "40%", "change": "+30%"}
+        dbc.Row([dbc.Col(dcc.Graph(figure=figure_cache.get(name)), md=width) for name, width in row])
+        for row in sections[key][1]
     ]
 
-# Layout
-app.layout = html.Div([
-    # Sidebar
-    html.Div([
-        html.H2("Alkod Lake", className="sidebar-header"),
-        html.H3("Dashboard", className="sidebar-subheader"),
-        html.Hr(),
-        dbc.Nav([
-            dbc.NavLink("Overview", href="#overview", active="exact"),
-            dbc.NavLink("Water Resources", href="#water", active="exact"),
-            dbc.NavLink("Agriculture", href="#agriculture", active="exact"),
-            dbc.NavLink("Economic Impact", href="#economic", active="exact"),
-            dbc.NavLink("Community", href="#community", active="exact"),
-            dbc.NavLink("Feedback", href="#feedback", active="exact"),
-        ], vertical=True, pills=True),
-    ], className="sidebar"),
-    
-    # Main content
-    html.Div([
-        # Summary Cards
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H4(stat["title"], className="card-title"),
-                        html.H2(stat["value"], className="card-value"),
-                        html.P(f"YoY Change: {stat['change']}", className="card-change"),
-                    ])
-                ], className="summary-card")
-            ], width=3) for stat in create_summary_stats()
-        ], className="mb-4"),
-
-        # Overview Section
-        html.Div([
-            html.H2("Overview", id="overview", className="section-header"),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.pie(data_gender_age, names='Category', values='Percentage',
-                                title="Demographics Overview",
-                                color_discrete_sequence=px.colors.sequential.RdBu)
-                ), md=6),
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_water_availability, x="Category", y="Respondents",
-                                color="Year", barmode="group", title="Water Availability Changes",
-                                color_discrete_sequence=px.colors.qualitative.Set1)
-                ), md=6),
-            ]),
-        ], className="section"),
-
-        # Water Resources Section
-        html.Div([
-            html.H2("Water Resources", id="water", className="section-header"),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.line(data_agri_water.melt(id_vars="Year", var_name="Condition", 
-                                                       value_name="Percentage"),
-                                 x="Year", y="Percentage", color="Condition",
-                                 title="Agricultural Water Availability",
-                                 color_discrete_sequence=px.colors.qualitative.Dark2)
-                ), md=12),
-            ]),
-        ], className="section"),
-
-        # Agriculture Section
-        html.Div([
-            html.H2("Agriculture", id="agriculture", className="section-header"),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_irrigation, x="Practice", y="Percentage",
-                                title="Irrigation Practices",
-                                color_discrete_sequence=px.colors.sequential.Viridis)
-                ), md=6),
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_crop_types, x="Crop", y="Percentage",
-                                color="Year", barmode="group",
-                                title="Crop Types (2021 vs. 2024)",
-                                color_discrete_sequence=px.colors.qualitative.Plotly)
-                ), md=6),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_yield_changes, x="Category", y="Percentage",
-                                orientation="h", title="Yield Changes",
-                                color_discrete_sequence=px.colors.sequential.Blues)
-                ), md=12),
-            ]),
-        ], className="section"),
+# Layout, rebuilt for each data snapshot since the summary cards depend on the data
+@snapshot_cache
+def serve_layout():
+    return html.Div([
+        dcc.Location(id="url"),
+        # Filled by assets/lazy_sections.js as sections scroll into view
+        dcc.Store(id="visible-sections", data=[]),
 
-        # Economic Impact Section
+        # Sidebar
         html.Div([
-            html.H2("Economic Impact", id="economic", className="section-header"),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.area(data_income.melt(id_vars="Year", var_name="Income Level",
-                                                  value_name="Percentage"),
-                                 x="Year", y="Percentage", color="Income Level",
-                                 title="Income Changes Over Time",
-                                 color_discrete_sequence=px.colors.sequential.Sunset)
-                ), md=12),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.pie(data_economic, names="Activity", values="Percentage",
-                                title="Economic Activities",
-                                color_discrete_sequence=px.colors.sequential.Emrld)
-                ), md=6),
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_employment, x="Activity", y="Percentage",
-                                title="Employment Opportunities",
-                                color_discrete_sequence=px.colors.qualitative.Set3)
-                ), md=6),
-            ]),
-        ], className="section"),
-
-        # Community Impact Section
-        html.Div([
-            html.H2("Community Impact", id="community", className="section-header"),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_wellbeing.melt(id_vars="Year", var_name="Rating",
-                                                     value_name="Percentage"),
-                                x="Year", y="Percentage", color="Rating", barmode="group",
-                                title="Well-being Ratings Over Time",
-                                color_discrete_sequence=px.colors.qualitative.T10)
-                ), md=12),
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_community, x="Improvement", y="Percentage",
-                                orientation="h",
-                                title="Community Benefits from Lake Rejuvenation",
-                                color_discrete_sequence=px.colors.sequential.Mint)
-                ), md=6),
-                dbc.Col(dcc.Graph(
-                    figure=px.pie(data_benefits, names="Category", values="Percentage",
-                                title="Significant Benefits",
-                                color_discrete_sequence=px.colors.qualitative.Bold)
-                ), md=6),
-            ]),
-        ], className="section"),
-
-        # Feedback Section
+            html.H2("Alkod Lake", className="sidebar-header"),
+            html.H3("Dashboard", className="sidebar-subheader"),
+            html.Hr(),
+            dbc.Nav([
+                dbc.NavLink("Overview", href="#overview", active="exact"),
+                dbc.NavLink("Water Resources", href="#water", active="exact"),
+                dbc.NavLink("Agriculture", href="#agriculture", active="exact"),
+                dbc.NavLink("Economic Impact", href="#economic", active="exact"),
+                dbc.NavLink("Community", href="#community", active="exact"),
+                dbc.NavLink("Feedback", href="#feedback", active="exact"),
+            ], vertical=True, pills=True),
+        ], className="sidebar"),
+    
+        # Main content
         html.Div([
-            html.H2("Feedback & Suggestions", id="feedback", className="section-header"),
+            # Summary Cards, computed from the survey data (see kpis.py)
             dbc.Row([
-                dbc.Col(dcc.Graph(
-                    figure=px.bar(data_suggestions, x="Suggestion", y="Frequency",
-                                title="Suggestions Distribution",
-                                color_discrete_sequence=px.colors.qualitative.Safe)
-                ), md=12),
-            ]),
-        ], className="section"),
-    ], className="main-content"),
-])
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H4(stat["title"], className="card-title"),
+                            html.H2(stat["value"], className="card-value"),
+                            html.P(f"YoY Change: {stat['change']}", className="card-change"),
+                        ])
+                    ], className="summary-card")
+                ], width=3) for stat in summary_stats()
+            ], className="mb-4"),
+
+            # Sections start as empty placeholders and are filled in on demand
+            *[
+                html.Div([
+                    html.H2(title, id=key, className="section-header"),
+                    html.Div(id=f"{key}-body", className="section-placeholder"),
+                ], className="section lazy-section", **{"data-section": key})
+                for key, (title, _) in sections.items()
+            ],
+        ], className="main-content"),
+    ])
+
+app.layout = serve_layout
+
+
+def warm():
+    """Build everything a first page view would, for the current data snapshot."""
+    figure_cache.warm()
+    for key in sections:
+        build_section(key)
+    serve_layout()
+
+
+install_hot_reload(server, warm)
+
+
+def register_section(key):
+    @app.callback(
+        Output(f"{key}-body", "children"),
+        Output(f"{key}-body", "className"),
+        Input("url", "hash"),
+        Input("visible-sections", "data"),
+        State(f"{key}-body", "className"),
+    )
+    def render_section(url_hash, visible, class_name):
+        # Already rendered: keep what the browser has
+        if class_name == "section-body":
+            raise PreventUpdate
+        requested = {(url_hash or "#overview").lstrip("#")} | set(visible or [])
+        if key not in requested:
+            raise PreventUpdate
+        return build_section(key), "section-body"
+
+
+for key in sections:
+    register_section(key)
 
 # Custom CSS
 app.index_string = '''
@@ -258,114 +163,6 @@ app.index_string = '''
         <title>Alkod Lake Dashboard</title>
         {%favicon%}
         {%css%}
-        <style>
-            :root {
-                --sidebar-width: 260px;
-                --primary-color: #2c3e50;
-                --secondary-color: #3498db;
-            }
-            
-            body {
-                background-color: #f8f9fa;
-                margin: 0;
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            }
-            
-            .sidebar {
-                position: fixed;
-                top: 0;
-                left: 0;
-                bottom: 0;
-                width: var(--sidebar-width);
-                padding: 2rem;
-                background-color: var(--primary-color);
-                color: white;
-                overflow-y: auto;
-                box-shadow: 2px 0 5px rgba(0,0,0,0.1);
-            }
-            
-            .sidebar-header {
-                color: white;
-                font-size: 2rem;
-                margin-bottom: 0;
-                font-weight: 600;
-            }
-            
-            .sidebar-subheader {
-                color: var(--secondary-color);
-                font-size: 1.5rem;
-                margin-top: 0;
-                margin-bottom: 1.5rem;
-            }
-            
-            .main-content {
-                margin-left: var(--sidebar-width);
-                padding: 2rem;
-                background-color: #f8f9fa;
-                min-height: 100vh;
-            }
-            
-            .section {
-                margin-bottom: 3rem;
-                padding: 2rem;
-                background-color: white;
-                border-radius: 12px;
-                box-shadow: 0 2px 12px rgba(0,0,0,0.1);
-            }
-            
-            .section-header {
-                color: var(--primary-color);
-                margin-bottom: 1.5rem;
-                padding-bottom: 0.5rem;
-                border-bottom: 2px solid #e9ecef;
-            }
-            
-            .nav-link {
-                color: #ecf0f1 !important;
-                margin-bottom: 0.5rem;
-                border-radius: 6px;
-                transition: all 0.3s ease;
-            }
-            
-            .nav-link:hover {
-                background-color: rgba(52, 152, 219, 0.3) !important;
-                transform: translateX(5px);
-            }
-            
-            .nav-link.active {
-                background-color: var(--secondary-color) !important;
-                font-weight: 600;
-            }
-            
-            .summary-card {
-                border-radius: 10px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-                transition: transform 0.3s ease;
-            }
-            
-            .summary-card:hover {
-                transform: translateY(-5px);
-            }
-            
-            .card-title {
-                color: var(--primary-color);
-                font-size: 1rem;
-                font-weight: 600;
-            }
-            
-            .card-value {
-                color: var(--secondary-color);
-                font-size: 2rem;
-                font-weight: 700;
-                margin: 0.5rem 0;
-            }
-            
-            .card-change {
-                color: #27ae60;
-                font-weight: 500;
-                margin: 0;
-            }
-        </style>
     </head>
     <body>
         {%app_entry%}
@@ -0,0 +1,210 @@
+"""Request and callback metrics for the dashboards.
+
+Set ALKOD_METRICS=1 to record, per Flask route and per Dash callback:
+
+- request counts by status
+- latency histograms, with p50/p95/p99 estimated from the buckets
+- response bytes
+- time spent serializing callback output (from the callback's return to
+  the end of the request), and each figure's JSON serialization on a cache miss
+
+The numbers are exposed in Prometheus text format on /metrics, and each
+response carries a Server-Timing header that browser dev tools display.
+Counts are per process; with several Gunicorn workers each scrape of
+/metrics reaches one of them. When ALKOD_METRICS is unset `instrument`
+returns without touching the app, so nothing runs per request.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("ALKOD_METRICS", "").lower() in ("1", "true", "yes")
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(2**n for n in range(10, 25, 2))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets=SECONDS_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines += [f"# HELP {name} {self.help.get(name, name)}", f"# TYPE {name} counter"]
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{label_string(labels)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                series = sorted((labels, h) for (metric, labels), h in self.histograms.items() if metric == name)
+                lines += [f"# HELP {name} {self.help.get(name, name)}", f"# TYPE {name} histogram"]
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{label_string(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{label_string(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{label_string(labels)} {histogram.count}")
+                lines += [f"# HELP {name}_quantile Estimated from the {name} buckets",
+                          f"# TYPE {name}_quantile gauge"]
+                for labels, histogram in series:
+                    for q in QUANTILES:
+                        value = histogram.quantile(q)
+                        lines.append(f"{name}_quantile{label_string(labels + (('quantile', str(q)),))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def label_string(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+registry.help.update({
+    "alkod_requests_total": "HTTP requests by route and status",
+    "alkod_request_seconds": "HTTP request latency by route",
+    "alkod_response_bytes": "HTTP response body size by route",
+    "alkod_callback_seconds": "Dash callback function time",
+    "alkod_callback_serialize_seconds": "Time from a callback's return to the end of its request",
+    "alkod_callback_response_bytes": "Dash callback response body size",
+    "alkod_figure_serialize_seconds": "Time to serialize a figure to JSON when it is not yet cached",
+})
+
+
+def inc(name, labels, amount=1):
+    if ENABLED:
+        registry.inc(name, labels, amount)
+
+
+def observe(name, labels, value, buckets=SECONDS_BUCKETS):
+    if ENABLED:
+        registry.observe(name, labels, value, buckets)
+
+
+def instrument(app):
+    """Record metrics for `app`; call right after creating it, before registering callbacks."""
+    if not ENABLED:
+        return app
+    import flask
+    from dash import callback_context
+
+    server = app.server
+    register_callback = app.callback
+
+    def timed(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                outputs = callback_context.outputs_list
+                output = outputs[0] if isinstance(outputs, list) and outputs else outputs
+                triggered = callback_context.triggered_id
+                flask.g.alkod_callback = (start, end, {
+                    "callback": func.__name__,
+                    "output": str(output["id"]) if output else "",
+                    "trigger": str(triggered) if triggered is not None else "",
+                })
+        return wrapper
+
+    def callback(*args, **kwargs):
+        decorator = register_callback(*args, **kwargs)
+
+        def register(func):
+            decorator(timed(func))
+            return func
+        return register
+
+    app.callback = callback
+
+    @server.before_request
+    def start_timer():
+        flask.g.alkod_start = time.perf_counter()
+
+    @server.after_request
+    def record(response):
+        start = flask.g.pop("alkod_start", None)
+        if start is None:
+            return response
+        end = time.perf_counter()
+        route = flask.request.url_rule.rule if flask.request.url_rule else "unmatched"
+        size = response.content_length or 0
+        registry.inc("alkod_requests_total", {"route": route, "status": str(response.status_code)})
+        registry.observe("alkod_request_seconds", {"route": route}, end - start)
+        registry.observe("alkod_response_bytes", {"route": route}, size, BYTES_BUCKETS)
+        timings = [f"app;dur={1000 * (end - start):.2f}"]
+
+        callback_timing = flask.g.pop("alkod_callback", None)
+        if callback_timing is not None:
+            callback_start, callback_end, labels = callback_timing
+            registry.observe("alkod_callback_seconds", labels, callback_end - callback_start)
+            registry.observe("alkod_callback_serialize_seconds", labels, end - callback_end)
+            registry.observe("alkod_callback_response_bytes", labels, size, BYTES_BUCKETS)
+            timings += [f"callback;dur={1000 * (callback_end - callback_start):.2f}",
+                        f"serialize;dur={1000 * (end - callback_end):.2f}"]
+        response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return flask.Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
@@ -0,0 +1,197 @@
+"""Figure payload trimming and size reporting for the dashboards.
+
+Plotly Express embeds the complete template in every figure: default styling
+for ~50 trace types and for geo/polar/3-D subplots the dashboards never draw.
+`optimize_figure` keeps only the template entries a figure can use and drops
+attributes that merely restate plotly.js defaults. Where several figures ship
+in one payload (the client-mode figure store, the static export)
+`hoist_template` moves the shared template out so it is sent once.
+
+    python payload.py    # before/after bytes per figure
+"""
+import copy
+import gzip
+
+from dash import dcc
+from plotly.io.json import to_json_plotly
+
+try:
+    import brotli
+except ImportError:  # optional; sizes and responses fall back to gzip
+    brotli = None
+
+# Template layout keys that only style a subplot of that kind
+SUBPLOT_KEYS = ("geo", "map", "mapbox", "polar", "scene", "smith", "ternary")
+
+# (trace types or None for all, attribute path, value) that plotly.js assumes anyway
+TRACE_DEFAULTS = (
+    (None, ("legendgroup",), ""),
+    (None, ("xaxis",), "x"),
+    (None, ("yaxis",), "y"),
+    (None, ("marker", "pattern", "shape"), ""),
+    (("bar",), ("textposition",), "auto"),
+    (("pie",), ("domain",), {"x": [0.0, 1.0], "y": [0.0, 1.0]}),
+)
+
+
+def json_size(obj):
+    data = to_json_plotly(obj).encode("utf-8")
+    return len(data), len(gzip.compress(data))
+
+
+def optimize_figure(fig):
+    """Trimmed copy of a plain-dict figure that renders the same in plotly.js."""
+    fig = copy.deepcopy(fig)
+    layout = fig.setdefault("layout", {})
+    template = layout.get("template")
+    if template:
+        trim_template(template, fig)
+    template_data = (template or {}).get("data", {})
+    for trace in fig.get("data", []):
+        kind = trace.get("type", "scatter")
+        for kinds, path, value in TRACE_DEFAULTS:
+            if kinds and kind not in kinds:
+                continue
+            # A template value for the same attribute would win once it is dropped
+            if any(lookup(styled, path) is not None for styled in template_data.get(kind, [])):
+                continue
+            if lookup(trace, path) == value:
+                remove(trace, path)
+    return fig
+
+
+def trim_template(template, fig):
+    kinds = {trace.get("type", "scatter") for trace in fig.get("data", [])}
+    template["data"] = {kind: styles for kind, styles in template.get("data", {}).items() if kind in kinds}
+    layout = fig["layout"]
+    template_layout = template.get("layout", {})
+    cartesian = any(key.startswith(("xaxis", "yaxis")) for key in layout)
+    for key in list(template_layout):
+        if key in SUBPLOT_KEYS and key not in layout:
+            del template_layout[key]
+        elif key in ("xaxis", "yaxis") and not cartesian:
+            del template_layout[key]
+        elif key in ("colorscale", "coloraxis") and not continuous_color(fig):
+            del template_layout[key]
+
+
+def continuous_color(fig):
+    if any(key.startswith("coloraxis") for key in fig["layout"]):
+        return True
+    for trace in fig.get("data", []):
+        if trace.get("type", "scatter") not in ("bar", "pie", "scatter"):
+            return True
+        marker = trace.get("marker", {})
+        color = marker.get("color")
+        if "colorscale" in marker or "coloraxis" in marker or isinstance(color, dict) or (
+                isinstance(color, list) and color and not isinstance(color[0], str)):
+            return True
+    return False
+
+
+def lookup(node, path):
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return None
+        node = node[key]
+    return node
+
+
+def remove(node, path):
+    parents = []
+    for key in path[:-1]:
+        parents.append((node, key))
+        node = node[key]
+    del node[path[-1]]
+    # Drop containers left empty, e.g. marker.pattern once its shape is gone
+    for parent, key in reversed(parents):
+        if parent[key]:
+            break
+        del parent[key]
+
+
+def hoist_template(figures):
+    """Split out the template shared by `figures` (name -> figure dict).
+
+    Returns (template, figures without it). A figure whose template disagrees
+    with the others keeps its own.
+    """
+    shared = {"data": {}, "layout": {}}
+    hoisted = {}
+    for name, fig in figures.items():
+        template = fig.get("layout", {}).get("template")
+        if template and merge_template(shared, template):
+            fig = dict(fig, layout={k: v for k, v in fig["layout"].items() if k != "template"})
+        hoisted[name] = fig
+    return shared, hoisted
+
+
+def merge_template(shared, template):
+    for part in ("data", "layout"):
+        for key, value in template.get(part, {}).items():
+            if shared[part].get(key, value) != value:
+                return False
+    for part in ("data", "layout"):
+        shared[part].update(template.get(part, {}))
+    return True
+
+
+def compressed_sizes(data):
+    sizes = {"raw": len(data), "gzip": len(gzip.compress(data))}
+    if brotli is not None:
+        sizes["br"] = len(brotli.compress(data))
+    return sizes
+
+
+def figure_report(registry):
+    """Bytes per figure as Plotly Express builds it and after optimize_figure."""
+    from figure_cache import serialize
+
+    report = {}
+    for name in registry:
+        before = to_json_plotly(registry[name]).encode("utf-8")
+        report[name] = {"before": compressed_sizes(before), "after": compressed_sizes(serialize(registry[name]))}
+    return report
+
+
+def print_figure_report(report):
+    encodings = list(next(iter(report.values()))["before"])
+    print(f"{'figure':<20}" + "".join(f"{e + ' before':>14}{e + ' after':>14}" for e in encodings))
+    for name, sizes in report.items():
+        print(f"{name:<20}" + "".join(f"{sizes['before'][e]:>14}{sizes['after'][e]:>14}" for e in encodings))
+    print(f"{'total':<20}" + "".join(
+        f"{sum(s['before'][e] for s in report.values()):>14}{sum(s['after'][e] for s in report.values()):>14}"
+        for e in encodings))
+
+
+def switching_report(figure_cache, button_figures):
+    # Server mode: one callback response per click
+    clicks = {}
+    for button_id, name in button_figures.items():
+        response = {"multi": True, "response": {"content": {"children": dcc.Graph(figure=figure_cache.get(name))}}}
+        clicks[button_id] = json_size(response)
+
+    # Client mode: every reachable figure ships once inside the layout's dcc.Store
+    template, figures = hoist_template({name: figure_cache.get(name) for name in set(button_figures.values())})
+    store = dcc.Store(id="figure-store", data={"buttons": button_figures, "template": template, "figures": figures})
+    return {"server": clicks, "client": json_size(store)}
+
+
+def print_switching_report(figure_cache, button_figures):
+    report = switching_report(figure_cache, button_figures)
+    print(f"{'button':<24}{'raw bytes':>12}{'gzip bytes':>12}")
+    for button_id, (raw, packed) in report["server"].items():
+        print(f"{button_id:<24}{raw:>12}{packed:>12}")
+    raw_total = sum(raw for raw, _ in report["server"].values())
+    packed_total = sum(packed for _, packed in report["server"].values())
+    print(f"{'server: one of each':<24}{raw_total:>12}{packed_total:>12}")
+    raw, packed = report["client"]
+    print(f"{'client: store, once':<24}{raw:>12}{packed:>12}")
+    print(f"Client mode breaks even after ~{packed / (packed_total / len(report['server'])):.1f} "
+          f"section switches per page load (gzip)")
+
+
+if __name__ == "__main__":
+    from figure_registry import FigureRegistry
+
+    print_figure_report(figure_report(FigureRegistry()))
@@ -0,0 +1,217 @@
+"""Partial plotly.js bundle limited to the trace types the dashboards draw.
+
+dcc.Graph loads the full plotly.js (~4.8 MB) on first use, although every
+figure in FIGURE_SPECS is a pie, bar or scatter (px.line/px.area) trace.
+
+    python plotly_bundle.py traces      # trace types found in the figure registry
+    python plotly_bundle.py vendor      # download the smallest official partial bundle covering them
+    python plotly_bundle.py build --plotlyjs-src ../plotly.js
+                                        # or build one with exactly those traces (needs node)
+    python plotly_bundle.py measure     # transfer size and parse time, full vs partial
+
+The bundle is saved in vendor/ next to a manifest of the traces it contains.
+At startup, if it still covers every registered trace type, asset_pipeline
+serves it as a fingerprinted bundle and points dcc.Graph's lazy plotly.js
+loader at it. Otherwise the full bundle is used, as before.
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import urllib.request
+import warnings
+
+import plotly
+from plotly.offline import get_plotlyjs_version
+
+from figure_registry import FIGURE_SPECS, FigureRegistry
+
+try:
+    import brotli
+except ImportError:  # optional; only used for the size report
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+VENDOR_DIR = os.path.join(ROOT, "vendor")
+MANIFEST = os.path.join(VENDOR_DIR, "plotly-bundle.json")
+FULL_BUNDLE = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+
+# plotly.express function -> the trace type it produces
+PX_TRACE_TYPES = {
+    "area": "scatter",
+    "bar": "bar",
+    "box": "box",
+    "density_heatmap": "histogram2d",
+    "funnel": "funnel",
+    "histogram": "histogram",
+    "line": "scatter",
+    "pie": "pie",
+    "scatter": "scatter",
+    "sunburst": "sunburst",
+    "treemap": "treemap",
+    "violin": "violin",
+}
+
+# Official partial bundles published with each plotly.js release, smallest first
+OFFICIAL_BUNDLES = {
+    "basic": {"bar", "pie", "scatter"},
+    "cartesian": {"bar", "box", "contour", "heatmap", "histogram", "histogram2d", "histogram2dcontour",
+                  "image", "pie", "scatter", "scatterternary", "violin"},
+    "finance": {"bar", "candlestick", "funnel", "funnelarea", "histogram", "indicator", "ohlc", "pie",
+                "scatter", "waterfall"},
+}
+CDN_URL = "https://cdn.plot.ly/plotly-{bundle}-{version}.min.js"
+
+# Compile time only: plotly.js needs a DOM to run, and parsing is the cost that
+# grows with bundle size. A unique suffix per run defeats V8's compilation cache.
+PARSE_SCRIPT = """
+const vm = require('vm');
+const source = require('fs').readFileSync(process.argv[2], 'utf8');
+const times = [];
+for (let i = 0; i < Number(process.argv[3]); i++) {
+    const start = process.hrtime.bigint();
+    new vm.Script(source + '\\n//' + i);
+    times.push(Number(process.hrtime.bigint() - start) / 1e6);
+}
+console.log(JSON.stringify(times));
+"""
+
+
+def registry_trace_types(specs=FIGURE_SPECS):
+    """Trace types drawn by the registered figures; unknown px kinds are built to find out."""
+    types = set()
+    registry = None
+    for name, spec in specs.items():
+        if spec["kind"] in PX_TRACE_TYPES:
+            types.add(PX_TRACE_TYPES[spec["kind"]])
+            continue
+        registry = registry or FigureRegistry()
+        types.update(trace.type for trace in registry[name].data)
+    return types
+
+
+def read_manifest():
+    try:
+        with open(MANIFEST) as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def write_manifest(filename, traces, source):
+    manifest = {"file": filename, "traces": sorted(traces), "plotlyjs_version": get_plotlyjs_version(),
+                "source": source}
+    with open(MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def partial_bundle(traces=None):
+    """Path of the vendored partial bundle if it covers `traces` (default: the registry's), else None."""
+    manifest = read_manifest()
+    if manifest is None:
+        return None
+    traces = registry_trace_types() if traces is None else traces
+    missing = set(traces) - set(manifest["traces"])
+    if missing:
+        warnings.warn(f"{manifest['file']} lacks trace types {sorted(missing)}; serving the full plotly.js. "
+                      f"Rebuild it with `python plotly_bundle.py vendor`.")
+        return None
+    if manifest["plotlyjs_version"] != get_plotlyjs_version():
+        warnings.warn(f"{manifest['file']} is plotly.js {manifest['plotlyjs_version']} but plotly.py expects "
+                      f"{get_plotlyjs_version()}; serving the full plotly.js.")
+        return None
+    return os.path.join(VENDOR_DIR, manifest["file"])
+
+
+def vendor(traces):
+    for bundle, covered in OFFICIAL_BUNDLES.items():
+        if traces <= covered:
+            break
+    else:
+        raise SystemExit(f"No official partial bundle covers {sorted(traces)}; use `build` instead")
+    url = CDN_URL.format(bundle=bundle, version=get_plotlyjs_version())
+    filename = os.path.basename(url)
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    with urllib.request.urlopen(url) as response, open(os.path.join(VENDOR_DIR, filename), "wb") as f:
+        f.write(response.read())
+    return write_manifest(filename, covered, url)
+
+
+def build(traces, plotlyjs_src):
+    """Build a bundle with exactly `traces` using plotly.js's own custom-bundle task."""
+    name = "alkod"
+    subprocess.run(
+        ["npm", "run", "custom-bundle", "--", "--traces", ",".join(sorted(traces)), "--out", name],
+        cwd=plotlyjs_src, check=True,
+    )
+    filename = f"plotly-{name}-{get_plotlyjs_version()}.min.js"
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    with open(os.path.join(plotlyjs_src, "dist", f"plotly-{name}.min.js"), "rb") as src, \
+            open(os.path.join(VENDOR_DIR, filename), "wb") as dst:
+        dst.write(src.read())
+    return write_manifest(filename, traces, f"plotly.js custom-bundle --traces {','.join(sorted(traces))}")
+
+
+def parse_times(path, runs=7):
+    with tempfile.NamedTemporaryFile("w", suffix=".js", delete=False) as f:
+        f.write(PARSE_SCRIPT)
+    try:
+        output = subprocess.run(["node", f.name, path, str(runs)], check=True, capture_output=True, text=True)
+    finally:
+        os.unlink(f.name)
+    return json.loads(output.stdout)
+
+
+def measure(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    result = {"bytes": len(data), "gzip_bytes": len(gzip.compress(data, compresslevel=9))}
+    if brotli is not None:
+        result["br_bytes"] = len(brotli.compress(data, quality=11))
+    try:
+        result["parse_ms"] = statistics.median(parse_times(path))
+    except (OSError, subprocess.CalledProcessError):
+        result["parse_ms"] = None
+    return result
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    return f"{value:.1f}" if isinstance(value, float) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partial plotly.js bundle for the registered figures")
+    parser.add_argument("command", choices=("traces", "vendor", "build", "measure"))
+    parser.add_argument("--plotlyjs-src", help="plotly.js checkout with node_modules installed (build)")
+    args = parser.parse_args()
+
+    traces = registry_trace_types()
+    if args.command == "traces":
+        print(" ".join(sorted(traces)))
+    elif args.command == "vendor":
+        print(json.dumps(vendor(traces), indent=2))
+    elif args.command == "build":
+        if not args.plotlyjs_src:
+            parser.error("build needs --plotlyjs-src")
+        print(json.dumps(build(traces, args.plotlyjs_src), indent=2))
+    else:
+        bundles = {"full": FULL_BUNDLE}
+        if partial_bundle(traces):
+            bundles["partial"] = partial_bundle(traces)
+        results = {name: measure(path) for name, path in bundles.items()}
+        columns = [c for c in ("bytes", "gzip_bytes", "br_bytes", "parse_ms") if c in results["full"]]
+        print(f"{'bundle':<10}" + "".join(f"{c:>14}" for c in columns))
+        for name, result in results.items():
+            print(f"{name:<10}" + "".join(f"{format_value(result[c]):>14}" for c in columns))
+        if "partial" not in results:
+            print("No partial bundle vendored; run `python plotly_bundle.py vendor` first")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Opt-in per-request sampling profiler.
+
+Set ALKOD_PROFILE_TOKEN to a secret, then send a request with the header
+`X-Alkod-Profile: <token>` or the query string `?profile=<token>`. While that
+request runs, a background thread samples the request thread's Python stack
+every ALKOD_PROFILE_INTERVAL_MS milliseconds (default 1). The stacks are
+written in collapsed ("folded") format, weighted by microseconds, to
+
+    ALKOD_PROFILE_DIR/<route>/<time>-<pid>-<n>.folded
+
+Dash callback requests are filed under the callback's output and trigger. The
+files feed straight into flamegraph.pl, speedscope or inferno, and show
+whether a slow section is spending its time in pandas, Plotly Express or JSON
+encoding. The path is returned in an X-Alkod-Profile-File response header.
+Without a token the profiler is never installed.
+"""
+import hmac
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_TOKEN = os.environ.get("ALKOD_PROFILE_TOKEN")
+PROFILE_DIR = os.environ.get("ALKOD_PROFILE_DIR", "profiles")
+INTERVAL = float(os.environ.get("ALKOD_PROFILE_INTERVAL_MS", 1)) / 1000
+
+UNSAFE_CHARACTERS = re.compile(r"[^A-Za-z0-9_.=-]+")
+
+_sequence = itertools.count()
+
+
+class StackSampler:
+    """Samples one thread's stack from a background thread until stopped."""
+
+    def __init__(self, thread_id, interval=INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                # Weight by the time actually elapsed: the GIL can delay a sample
+                self.stacks[fold(frame)] += int((now - last) * 1e6)
+            last = now
+
+
+def fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def write_folded(stacks, route, directory=PROFILE_DIR):
+    directory = os.path.join(directory, UNSAFE_CHARACTERS.sub("_", route).strip("_")[:120] or "root")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}.folded")
+    with open(path, "w") as f:
+        for stack, weight in stacks.most_common():
+            if weight:
+                f.write(f"{stack} {weight}\n")
+    return path
+
+
+def route_name(request):
+    if request.path.endswith("/_dash-update-component"):
+        body = request.get_json(silent=True) or {}
+        output = str(body.get("output", "")).strip(".")
+        triggers = body.get("changedPropIds") or ["initial"]
+        return f"callback-{output}-{triggers[0]}"
+    return request.url_rule.rule if request.url_rule else request.path
+
+
+def requested(request):
+    token = request.headers.get("X-Alkod-Profile") or request.args.get("profile")
+    # As bytes: compare_digest rejects str with non-ASCII characters
+    return bool(token) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def install_profiler(server):
+    """Profile requests to the Flask `server` that carry the profiling token."""
+    if not PROFILE_TOKEN:
+        return server
+    import flask
+
+    @server.before_request
+    def start_sampling():
+        if requested(flask.request):
+            flask.g.alkod_sampler = StackSampler(threading.get_ident()).start()
+
+    @server.after_request
+    def write_profile(response):
+        sampler = flask.g.pop("alkod_sampler", None)
+        if sampler is not None:
+            path = write_folded(sampler.stop(), route_name(flask.request))
+            response.headers["X-Alkod-Profile-File"] = path
+        return response
+
+    @server.teardown_request
+    def stop_sampling(_exc):
+        # after_request is skipped when the view raises
+        sampler = flask.g.pop("alkod_sampler", None)
+        if sampler is not None:
+            write_folded(sampler.stop(), route_name(flask.request))
+
+    return server
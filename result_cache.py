@@ -0,0 +1,115 @@
+"""In-process result caches."""
+import threading
+from collections import OrderedDict
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller computes; callers arriving while it runs wait for it and
+    share its result, or its exception. Nothing is kept once the call ends,
+    so this only removes duplicate work in flight; caching is up to the caller.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = compute()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values.
+
+    Callers pass each value's size (e.g. its serialized byte length); the least
+    recently used entries are evicted once the total exceeds `max_bytes`.
+    Concurrent misses on one key in get_or_compute compute it once.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+        return value
+
+    def get_or_compute(self, key, compute, sizeof):
+        value = self.get(key)
+        if value is None:
+            value = self._flights.do(key, lambda: self._fill(key, compute, sizeof))
+        return value
+
+    def _fill(self, key, compute, sizeof):
+        with self._lock:
+            entry = self._entries.get(key)
+        # Stored by a computation that finished between our miss and taking the lead
+        if entry is not None:
+            return entry[0]
+        value = compute()
+        return self.set(key, value, sizeof(value))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,82 @@
+"""Production server for the dashboards.
+
+    python serve.py main_version1 --workers 4 --threads 8 --bind 0.0.0.0:8050
+
+The entry point is imported and warmed up once in the master process, before
+Gunicorn forks its workers, so the built figures, layouts and aggregates are
+shared copy-on-write rather than rebuilt per worker. Debug mode, the reloader
+and dev tools are never enabled here. Where Gunicorn is unavailable (Windows)
+Waitress serves the same app from a single multi-threaded process.
+"""
+import argparse
+import gc
+import os
+
+from entry_points import ENTRY_POINTS, load_entry_point
+from metrics import registry as metrics_registry
+from snapshot import after_fork, watcher_suppressed
+
+
+def warm(module):
+    """Build everything a first request would otherwise build, once, before fork."""
+    # Figures, sections, layout and the cube: workers share them copy-on-write.
+    # The same warm-up runs for new data before it is swapped in (see snapshot.py)
+    module.warm()
+    client = module.app.server.test_client()
+    # The master only forks: data watchers run in the workers (see run_gunicorn)
+    with watcher_suppressed():
+        for path in ("/", "/_dash-layout", "/_dash-dependencies"):
+            client.get(path)
+    # Warm-up requests should not show up in the workers' metrics
+    metrics_registry.clear()
+
+
+def run_gunicorn(server, bind, workers, threads, timeout):
+    from gunicorn.app.base import BaseApplication
+
+    class DashApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("timeout", timeout)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("post_fork", lambda arbiter, worker: after_fork())
+
+        def load(self):
+            return server
+
+    DashApplication().run()
+
+
+def run_waitress(server, bind, threads):
+    import waitress
+
+    waitress.serve(server, listen=bind, threads=threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a dashboard with a production WSGI server")
+    parser.add_argument("entry_point", choices=sorted(ENTRY_POINTS))
+    parser.add_argument("--bind", default=os.environ.get("ALKOD_BIND", "0.0.0.0:8050"))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ALKOD_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("ALKOD_THREADS", 8)))
+    parser.add_argument("--timeout", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    module = load_entry_point(args.entry_point)
+    warm(module)
+    # Keep the warmed objects out of the collector's reach so workers don't dirty their pages
+    gc.freeze()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_waitress(module.app.server, args.bind, args.threads)
+    else:
+        run_gunicorn(module.app.server, args.bind, args.workers, args.threads, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Cross-process result cache in a local SQLite file.
+
+Each Gunicorn worker has its own in-process caches (result_cache.LRUCache).
+On their own, every worker would compute and hold every figure and aggregate
+itself: N workers, N times the misses. The shared cache sits under the
+in-process ones. A miss there looks here before computing, and whatever one
+worker computes, every worker (and the next restart) reads back.
+
+Entries are bytes in one SQLite table (ALKOD_SHARED_CACHE, default
+build/shared_cache.sqlite; set it empty to turn the cache off), keyed by a
+hash of the caller's key. WAL mode lets workers read while one writes, and
+the file is memory-mapped so they share its pages through the OS page cache.
+The least recently used entries are evicted to keep the total under
+ALKOD_SHARED_CACHE_MB (default 256). Keys must identify content, e.g. by
+including the data version: entries are evicted but never invalidated.
+Every key is also hashed with FORMAT and the versions of Python and the
+libraries that produce or read the values. After an upgrade, or a code change
+that bumps FORMAT, old entries are no longer found and age out. A value that
+fails to decode anyway is treated as a miss and recomputed. The database is
+opened on first use, so processes that never cache anything leave no file
+behind.
+
+get_or_compute is single-flight across processes as well. The first worker
+to miss claims the key, and workers that miss it meanwhile wait for its
+result rather than computing it again. A claim is abandoned when its process
+exits or after CLAIM_TIMEOUT seconds.
+"""
+import hashlib
+import importlib.metadata
+import logging
+import os
+import platform
+import sqlite3
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PATH = os.environ.get("ALKOD_SHARED_CACHE", os.path.join(ROOT, "build", "shared_cache.sqlite"))
+MAX_BYTES = int(os.environ.get("ALKOD_SHARED_CACHE_MB", 256)) * 2**20
+# Reads refresh an entry's last use at most this often, so hits rarely write
+TOUCH_INTERVAL = 60
+CLAIM_TIMEOUT = 300
+CLAIM_POLL = 0.05
+# Bump when the meaning or encoding of cached values changes, e.g. how aggregates are counted
+FORMAT = 2
+LIBRARIES = ("pandas", "numpy", "plotly", "pyarrow")
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS claims (
+    key TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL
+);
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(f"PRAGMA mmap_size={MAX_BYTES * 2}")
+    return connection
+
+
+def library_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+# What cached values were written with; values pickled or rendered by other versions may not load
+CODE_VERSION = (FORMAT, platform.python_version(), *(library_version(name) for name in LIBRARIES))
+
+
+def key_digest(key):
+    # Keys are tuples of strings and numbers, whose repr is the same in every process
+    return hashlib.sha1(repr((CODE_VERSION, key)).encode()).hexdigest()
+
+
+class SharedCache:
+    def __init__(self, path=PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def get(self, key):
+        """The bytes stored under `key`, or None."""
+        digest = key_digest(key)
+        try:
+            db = self._db()
+            row = db.execute("SELECT value, used FROM entries WHERE key = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[1] < now - TOUCH_INTERVAL:
+                db.execute("UPDATE entries SET used = ? WHERE key = ?", (now, digest))
+        except sqlite3.OperationalError:
+            # Locked or unavailable: a miss only costs recomputing
+            return None
+        return row[0]
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        try:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("INSERT OR REPLACE INTO entries (key, value, size, used) VALUES (?, ?, ?, ?)",
+                           (key_digest(key), value, len(value), time.time()))
+                self._evict(db)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError:
+            pass
+
+    def get_or_compute(self, key, compute, encode, decode):
+        """`compute()` once across all processes, stored as `encode(value)`."""
+        found, value = self._decoded(key, self.get(key), decode)
+        if found:
+            return value
+        digest = key_digest(key)
+        claimed = self._claim(digest)
+        if not claimed:
+            found, value = self._decoded(key, self._wait(key, digest), decode)
+            if found:
+                return value
+        try:
+            value = compute()
+            self.set(key, encode(value))
+        finally:
+            if claimed:
+                self._release(digest)
+        return value
+
+    def _decoded(self, key, data, decode):
+        if data is None:
+            return False, None
+        try:
+            return True, decode(data)
+        except Exception:
+            # Unreadable despite the key's versions (e.g. a corrupt entry): recompute and overwrite it
+            logger.warning("Cannot decode shared cache entry %r; recomputing", key, exc_info=True)
+            return False, None
+
+    def _claim(self, digest):
+        try:
+            cursor = self._db().execute("INSERT OR IGNORE INTO claims (key, pid, started) VALUES (?, ?, ?)",
+                                        (digest, os.getpid(), time.time()))
+        except sqlite3.OperationalError:
+            # Cannot coordinate: compute without a claim
+            return False
+        return cursor.rowcount == 1
+
+    def _wait(self, key, digest):
+        """The value another process is computing, once it is stored; None if it gives up."""
+        while True:
+            try:
+                row = self._db().execute("SELECT pid, started FROM claims WHERE key = ?", (digest,)).fetchone()
+            except sqlite3.OperationalError:
+                return None
+            if row is None:
+                return self.get(key)
+            pid, started = row
+            if time.time() - started > CLAIM_TIMEOUT or not alive(pid):
+                self._release(digest)
+                return None
+            time.sleep(CLAIM_POLL)
+
+    def _release(self, digest):
+        try:
+            self._db().execute("DELETE FROM claims WHERE key = ?", (digest,))
+        except sqlite3.OperationalError:
+            pass
+
+    def clear(self):
+        self._db().execute("DELETE FROM entries")
+        self._db().execute("DELETE FROM claims")
+
+    def size(self):
+        return self._db().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self, db):
+        excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def _db(self):
+        # sqlite3 connections may not be shared between threads, nor survive a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = self._local.connection = connect(self.path)
+            connection.executescript(SCHEMA)
+            self._local.pid = os.getpid()
+        return connection
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+shared = SharedCache() if PATH else None
+
+
+def get_or_compute(key, compute, encode, decode):
+    """Through the shared cache when it is enabled, else just `compute()`."""
+    if shared is None:
+        return compute()
+    return shared.get_or_compute(key, compute, encode, decode)
@@ -0,0 +1,367 @@
+"""Hot reload of the survey data.
+
+Requests are served from a DataSnapshot: the datasets of one data version and
+everything derived from them (figure caches, sections, layouts). Snapshots
+are never modified; new data means a new snapshot.
+
+A watcher thread in each serving process polls the data sources every
+ALKOD_RELOAD_INTERVAL seconds (default 5, 0 turns it off). The sources are
+ALKOD_DATA_DIR, the survey store or raw survey files, and the census margins.
+When their files change, the thread loads the datasets and validates them
+against FIGURE_SPECS and KPI_SPECS. It then runs the entry point's warm-up
+against the new snapshot, so figures, sections and the layout are built
+before any request sees them. Only then is the snapshot swapped in, by a
+single assignment. If loading, validation or warm-up fails, the old data is
+still served and the error is logged.
+
+A request pins the snapshot that is current when it starts (flask.g). A swap
+during a request therefore never mixes two versions in one response.
+Every table has a content hash (figure_cache.frame_hash) and the snapshot's
+version is the hash of those. Derived caches are keyed by content, so a
+reload that changes one table only rebuilds what depends on it.
+
+The page-load GETs carry a weak ETag of their body (weak, since the
+compressed encodings carry the same one), remembered per snapshot. A
+browser revalidating with If-None-Match gets a 304 before anything is
+rendered. Since the body only depends on content, the ETag is the same from
+every worker and after a restart.
+"""
+import functools
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import flask
+import pandas as pd
+
+import metrics
+from datasets import read_datasets
+from figure_cache import frame_hash
+from figure_registry import FIGURE_SPECS
+from kpis import KPI_SPECS
+from survey_loader import survey_files
+from weighting import load_margins, margins_version
+
+INTERVAL = float(os.environ.get("ALKOD_RELOAD_INTERVAL", 5))
+# GET responses that are rendered from the data, or that a reload leaves unchanged
+TAGGED_PATHS = ("/", "/_dash-layout", "/_dash-dependencies")
+
+logger = logging.getLogger(__name__)
+
+metrics.registry.help.update({
+    "alkod_data_reloads_total": "Data reloads by result",
+    "alkod_data_reload_seconds": "Time to load, validate and warm a new data snapshot",
+})
+
+
+class DataSnapshot:
+    def __init__(self, datasets):
+        self.datasets = datasets
+        # Content hash of every table, and of the whole snapshot
+        self.hashes = {name: frame_hash(frame) for name, frame in datasets.items()}
+        self.version = content_version(self.hashes)
+        # ETags of responses rendered from this snapshot, by path
+        self.etags = {}
+        self._derived = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def derived(self, key, build):
+        """`build()`, called once per snapshot and key; concurrent callers wait for the first."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+        return self._derived[key]
+
+
+class PerSnapshot:
+    """Proxy to `build(datasets)`, built once per data snapshot.
+
+    Entry points hold one of these where they would hold an object derived
+    from the data, such as a FigureCache. Attribute access goes to the
+    instance for the snapshot of the current request.
+    """
+
+    def __init__(self, build):
+        self._build = build
+
+    def instance(self):
+        current_snapshot = snapshot()
+        return current_snapshot.derived(self, lambda: self._build(current_snapshot.datasets))
+
+    def __getattr__(self, name):
+        return getattr(self.instance(), name)
+
+    def __contains__(self, item):
+        return item in self.instance()
+
+
+def snapshot_cache(func):
+    """Like functools.lru_cache, but results belong to a snapshot and are dropped with it."""
+    @functools.wraps(func)
+    def cached(*args):
+        return snapshot().derived((func, args), lambda: func(*args))
+
+    return cached
+
+
+def content_version(hashes):
+    digest = hashlib.sha1()
+    for name, table_hash in sorted(hashes.items()):
+        digest.update(f"{name}:{table_hash}".encode())
+    # Filtered views re-aggregate the store's responses, which the tables only summarize.
+    # Store files are immutable once written, so their names and sizes identify them.
+    store_path = os.environ.get("ALKOD_SURVEY_STORE")
+    if store_path:
+        for fragment in store_files(store_path):
+            digest.update(f"{fragment}:{os.path.getsize(fragment)}".encode())
+        # New census margins reweight the same responses
+        digest.update(margins_version(load_margins()).encode())
+    return digest.hexdigest()
+
+
+def store_files(path):
+    return sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True))
+
+
+def source_files():
+    """Every file the datasets are read from."""
+    files = []
+    data_dir = os.environ.get("ALKOD_DATA_DIR")
+    if data_dir:
+        files += glob.glob(os.path.join(data_dir, "*.csv"))
+    store_path = os.environ.get("ALKOD_SURVEY_STORE")
+    if store_path:
+        files += store_files(store_path)
+    elif os.environ.get("ALKOD_SURVEY_PATH"):
+        files += survey_files(os.environ["ALKOD_SURVEY_PATH"])
+    if os.environ.get("ALKOD_MARGINS"):
+        files.append(os.environ["ALKOD_MARGINS"])
+    return files
+
+
+def source_signature():
+    # Cheap enough to poll: a stat per file, no reads
+    digest = hashlib.sha1()
+    for filename in sorted(source_files()):
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            continue
+        digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def validate(datasets):
+    """Raise ValueError unless every figure and KPI can be built from `datasets`."""
+    problems = []
+    for name in sorted({spec['data'] for spec in (*FIGURE_SPECS.values(), *KPI_SPECS.values())}):
+        frame = datasets.get(name)
+        if not isinstance(frame, pd.DataFrame) or frame.empty:
+            problems.append(f"{name}: missing or empty")
+    for figure, spec in FIGURE_SPECS.items():
+        frame = datasets.get(spec['data'])
+        if not isinstance(frame, pd.DataFrame) or frame.empty:
+            continue
+        melt = spec.get('melt')
+        if melt:
+            labels = [melt['id_vars']]
+            values = [column for column in frame.columns if column not in labels]
+        else:
+            labels = [spec[key] for key in ('x', 'names', 'color') if key in spec]
+            values = [spec[key] for key in ('y', 'values') if key in spec]
+        for column in labels + values:
+            if column not in frame:
+                problems.append(f"{spec['data']}: no column {column!r} (needed by {figure})")
+        for column in values:
+            if column in frame and not (pd.api.types.is_numeric_dtype(frame[column])
+                                        and frame[column].notna().all() and (frame[column] >= 0).all()):
+                problems.append(f"{spec['data']}: {column!r} must be non-negative numbers")
+    for kpi, spec in KPI_SPECS.items():
+        frame = datasets.get(spec['data'])
+        if isinstance(frame, pd.DataFrame):
+            for column in (spec['label'], spec['value']) if 'label' in spec else ("Year",):
+                if column not in frame:
+                    problems.append(f"{spec['data']}: no column {column!r} (needed by {kpi})")
+    if problems:
+        raise ValueError("; ".join(sorted(set(problems))))
+
+
+def load():
+    datasets = read_datasets()
+    validate(datasets)
+    return DataSnapshot(datasets)
+
+
+_current = None
+_signature = None
+_warmers = []
+_reload_lock = threading.Lock()
+_local = threading.local()
+_watcher_pid = None
+_watcher_suppressed = False
+
+
+def current():
+    """The latest snapshot, loaded on first use."""
+    global _current, _signature
+    if _current is None:
+        with _reload_lock:
+            if _current is None:
+                _signature = source_signature()
+                _current = load()
+    return _current
+
+
+def snapshot():
+    """The snapshot the current request, warm-up or job works against."""
+    pinned = getattr(_local, "snapshot", None)
+    if pinned is not None:
+        return pinned
+    if flask.has_request_context():
+        pinned = flask.g.get("alkod_snapshot")
+        if pinned is None:
+            pinned = flask.g.alkod_snapshot = current()
+        return pinned
+    return current()
+
+
+@contextmanager
+def pinned(data_snapshot):
+    previous = getattr(_local, "snapshot", None)
+    _local.snapshot = data_snapshot
+    try:
+        yield data_snapshot
+    finally:
+        _local.snapshot = previous
+
+
+def reload():
+    """Swap in a new snapshot if the source files changed; True if one was swapped in."""
+    global _current, _signature
+    old = current()
+    with _reload_lock:
+        signature = source_signature()
+        if signature == _signature:
+            return False
+        start = time.perf_counter()
+        try:
+            new = load()
+            if source_signature() != signature:
+                # Still being written; the next poll tries again
+                return False
+            if new.version != old.version:
+                with pinned(new):
+                    for warm in _warmers:
+                        warm()
+        except Exception:
+            logger.exception("Data reload failed; still serving version %s", old.version)
+            metrics.inc("alkod_data_reloads_total", {"result": "failed"})
+            # Not retried until the files change again
+            _signature = signature
+            return False
+        _signature = signature
+        if new.version == old.version:
+            # Files touched but the content is the same: keep the warm snapshot
+            return False
+        _current = new
+    metrics.inc("alkod_data_reloads_total", {"result": "swapped"})
+    metrics.observe("alkod_data_reload_seconds", {}, time.perf_counter() - start)
+    logger.info("Data version %s replaces %s", new.version, old.version)
+    return True
+
+
+def watch(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reload()
+        except Exception:
+            logger.exception("Data watcher error")
+
+
+def start_watcher(interval=INTERVAL):
+    global _watcher_pid
+    # Threads do not survive fork: start one in each worker process
+    if interval <= 0 or _watcher_suppressed or _watcher_pid == os.getpid():
+        return
+    with _reload_lock:
+        if _watcher_pid == os.getpid():
+            return
+        _watcher_pid = os.getpid()
+    threading.Thread(target=watch, args=(interval,), name="data-watcher", daemon=True).start()
+
+
+@contextmanager
+def watcher_suppressed():
+    """Serve requests without starting the watcher, e.g. warm-up requests before fork."""
+    global _watcher_suppressed
+    previous, _watcher_suppressed = _watcher_suppressed, True
+    try:
+        yield
+    finally:
+        _watcher_suppressed = previous
+
+
+def after_fork():
+    """Start the watcher in a forked worker; the parent's lock may have been held at the fork."""
+    global _reload_lock, _watcher_pid
+    _reload_lock = threading.Lock()
+    _watcher_pid = None
+    start_watcher()
+
+
+def install_hot_reload(server, warm=None):
+    """Pin a snapshot per request and reload the data in the background.
+
+    `warm()` builds what a first request would; it runs against each new
+    snapshot before the swap.
+    """
+    if warm is not None:
+        _warmers.append(warm)
+
+    @server.before_request
+    def pin_snapshot():
+        start_watcher()
+        flask.g.alkod_snapshot = current()
+    install_etags(server)
+
+
+def install_etags(server, paths=TAGGED_PATHS):
+    """Tag `paths` with an ETag of their body and answer matching revalidations with 304."""
+
+    def tagged():
+        return flask.request.method == "GET" and flask.request.path in paths and not flask.request.args
+
+    @server.before_request
+    def not_modified():
+        if not tagged():
+            return None
+        etag = snapshot().etags.get(flask.request.path)
+        if etag is None or not flask.request.if_none_match.contains_weak(etag):
+            return None
+        response = flask.Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.cache_control.no_cache = True
+        return response
+
+    @server.after_request
+    def set_etag(response):
+        if not tagged() or response.status_code != 200 or response.direct_passthrough:
+            return response
+        # Runs before compression (registered earlier), so the ETag is the uncompressed body's
+        etag = snapshot().etags.setdefault(flask.request.path, hashlib.sha1(response.get_data()).hexdigest())
+        response.set_etag(etag, weak=True)
+        # Always revalidate: after a reload the same URL serves new data
+        response.cache_control.no_cache = True
+        return response.make_conditional(flask.request)
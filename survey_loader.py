@@ -0,0 +1,253 @@
+"""Raw survey microdata ingestion.
+
+Reads per-respondent survey files (CSV or Parquet) in bounded chunks and
+reduces each chunk to category counts straight away, so memory is set by the
+chunk size rather than the number of respondents. The counts are turned into
+the same aggregate tables as the hand-typed ones in datasets.py.
+
+Counts are kept per (gender, age band) raking cell as well, so that with census
+margins configured every share is weighted (see weighting.py).
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from weighting import RAKE_COLUMNS, cell_weights, effective_size, load_margins
+
+YEAR = "year"
+# Pseudo-column counting respondents per (year, cell): the base the weights are raked on
+RESPONDENTS = "respondents"
+CELL_LEVELS = [f"{column}_cell" for column in RAKE_COLUMNS]
+
+# Raw survey column behind each dataset. "shape" is the table layout the
+# figure registry expects: "share" (label/value), "long" (Year/label/value)
+# or "wide" (Year plus one column per category).
+TABLES = {
+    "water_availability": dict(column="water_availability", shape="long", label="Category", value="Respondents"),
+    "agri_water": dict(column="agri_water", shape="wide"),
+    "irrigation": dict(column="irrigation", shape="share", label="Practice", value="Percentage"),
+    "crop_types": dict(column="crop", shape="long", label="Crop", value="Percentage"),
+    "yield_changes": dict(column="yield_change", shape="share", label="Category", value="Percentage"),
+    "income": dict(column="income_level", shape="wide"),
+    "economic": dict(column="economic_activity", shape="share", label="Activity", value="Percentage"),
+    "employment": dict(column="employment", shape="share", label="Activity", value="Percentage"),
+    "wellbeing": dict(column="wellbeing", shape="wide"),
+    "community": dict(column="community_improvement", shape="share", label="Improvement", value="Percentage"),
+    "benefits": dict(column="benefit", shape="share", label="Category", value="Percentage"),
+    "suggestions": dict(column="suggestion", shape="share", label="Suggestion", value="Frequency"),
+}
+
+# data_gender_age mixes two questions in one Category column
+DEMOGRAPHIC_COLUMNS = {"gender": "{}", "age_band": "Age {}"}
+
+# Rough in-memory cost of one categorical cell while a chunk is parsed
+BYTES_PER_CELL = 64
+
+
+def index_names(column):
+    return [YEAR, *CELL_LEVELS] + ([] if column == RESPONDENTS else [column])
+
+
+def survey_columns():
+    return [YEAR, *DEMOGRAPHIC_COLUMNS, *(spec["column"] for spec in TABLES.values())]
+
+
+def chunk_rows(memory_budget, n_columns):
+    return max(1000, int(memory_budget // (n_columns * BYTES_PER_CELL)))
+
+
+def survey_files(path):
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.csv")) + glob.glob(os.path.join(path, "*.parquet")))
+    return [path]
+
+
+def iter_chunks(path, columns=None, memory_budget=256 * 2**20):
+    """Yield DataFrame chunks of the survey file(s) at `path`."""
+    columns = columns or survey_columns()
+    rows = chunk_rows(memory_budget, len(columns))
+    for filename in survey_files(path):
+        if filename.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(filename, memory_map=True)
+            present = [c for c in columns if c in parquet.schema_arrow.names]
+            for batch in parquet.iter_batches(batch_size=rows, columns=present):
+                yield batch.to_pandas()
+        else:
+            header = pd.read_csv(filename, nrows=0).columns
+            present = [c for c in columns if c in header]
+            yield from pd.read_csv(filename, usecols=present, dtype="category", chunksize=rows)
+
+
+class SurveyCounts:
+    """Running respondent counts per (question, year, raking cell, category)."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, frame):
+        years = year_categorical(frame)
+        cells = [cell_categorical(frame, column) for column in RAKE_COLUMNS]
+        self.add_counts(RESPONDENTS, count_codes(years, *cells, names=index_names(RESPONDENTS)))
+        for column in (*DEMOGRAPHIC_COLUMNS, *(spec["column"] for spec in TABLES.values())):
+            if column not in frame:
+                continue
+            self.add_counts(column, count_codes(years, *cells, as_categorical(frame[column]),
+                                                names=index_names(column)))
+        return self
+
+    def merge(self, other, sign=1):
+        """Add (or with sign=-1, remove) another SurveyCounts; returns the columns touched."""
+        for column, counts in other.counts.items():
+            self.add_counts(column, counts * sign)
+        return set(other.counts)
+
+    def add_counts(self, column, counts):
+        """Add a (year, *cells, category) -> count Series for one raw column."""
+        previous = self.counts.get(column)
+        if previous is not None:
+            counts = previous.add(counts, fill_value=0)
+            counts = counts[counts != 0]
+        self.counts[column] = counts
+
+    def weights(self):
+        """Raking weight per (year, *cells), or None without census margins."""
+        margins = load_margins()
+        if margins is None or RESPONDENTS not in self.counts:
+            return None
+        return cell_weights(self.counts[RESPONDENTS], margins)
+
+    def weighted(self, column):
+        """(year, category) counts of `column`, weighted when margins are configured."""
+        counts = self.counts[column].astype(np.float64)
+        weights = self.weights()
+        if weights is not None:
+            counts = counts * weights.reindex(counts.index.droplevel(-1)).fillna(1.0).to_numpy()
+        return counts.groupby(level=[0, counts.index.nlevels - 1]).sum()
+
+    def sample_sizes(self, column):
+        """Respondents per year answering `column`; Kish's effective sample size when weighted."""
+        counts = self.counts[column].astype(np.float64)
+        cells = counts.groupby(level=list(range(counts.index.nlevels - 1))).sum()
+        weights = self.weights()
+        if weights is None:
+            return cells.groupby(level=0).sum()
+        return effective_size(cells, weights.reindex(cells.index).fillna(1.0))
+
+    def shares(self, column, by_year=True):
+        if column not in self.counts:
+            return None
+        counts = self.weighted(column)
+        if not by_year:
+            counts = counts.groupby(level=1).sum()
+            return (100 * counts / counts.sum()).round(1)
+        counts = counts.sort_index()
+        totals = counts.groupby(level=0).transform("sum")
+        return (100 * counts / totals).round(1)
+
+    def tables(self, names=None):
+        tables = {}
+        demographics = [] if names is not None and "gender_age" not in names else [
+            self.shares(column, by_year=False).rename(lambda c, fmt=fmt: fmt.format(c))
+            for column, fmt in DEMOGRAPHIC_COLUMNS.items()
+            if column in self.counts
+        ]
+        if demographics:
+            shares = pd.concat(demographics)
+            tables["gender_age"] = pd.DataFrame({"Category": shares.index, "Percentage": shares.values})
+        for name, spec in TABLES.items():
+            if spec["column"] not in self.counts or (names is not None and name not in names):
+                continue
+            tables[name] = shape_table(self, spec)
+        return tables
+
+
+def as_categorical(values):
+    # Categorical view of a column; CSV chunks and Parquet dictionaries already are
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.array
+    return pd.Categorical(values)
+
+
+def year_categorical(frame):
+    # Survey year of each row as text; surveys without a year column are all year ""
+    if YEAR not in frame:
+        return pd.Categorical.from_codes(np.zeros(len(frame), dtype=np.int8), categories=[""])
+    return as_categorical(frame[YEAR]).rename_categories(str)
+
+
+def cell_categorical(frame, column):
+    # Raking cell of each row; a missing answer (or column) is a cell of its own, ""
+    if column not in frame:
+        return pd.Categorical.from_codes(np.zeros(len(frame), dtype=np.int8), categories=[""])
+    values = as_categorical(frame[column])
+    if (values.codes < 0).any():
+        if "" not in values.categories:
+            values = values.add_categories([""])
+        values = values.fillna("")
+    return values
+
+
+def count_codes(*categoricals, names=None):
+    # Count category combinations with one bincount over combined codes
+    codes = [np.asarray(values.codes, dtype=np.int64) for values in categoricals]
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    shape = [len(values.categories) for values in categoricals]
+    combined = np.ravel_multi_index([c[valid] for c in codes], shape)
+    counts = np.bincount(combined, minlength=int(np.prod(shape)))
+    # Categories as text, as in the aggregate store's manifest, so saved counts cancel fresh ones
+    index = pd.MultiIndex.from_product([values.categories.astype(str) for values in categoricals], names=names)
+    counts = pd.Series(counts, index=index)
+    return counts[counts > 0]
+
+
+def shape_table(counts, spec):
+    table = build_table(counts, spec)
+    # Sample sizes behind the percentages, per year ("" for all years); see bootstrap.py
+    sizes = counts.sample_sizes(spec["column"])
+    table.attrs["respondents"] = (
+        {"": int(sizes.sum())} if spec["shape"] == "share" else {str(year): int(n) for year, n in sizes.items()}
+    )
+    return table
+
+
+def build_table(counts, spec):
+    if spec["shape"] == "share":
+        shares = counts.shares(spec["column"], by_year=False)
+        return pd.DataFrame({spec["label"]: shares.index, spec["value"]: shares.values})
+    shares = counts.shares(spec["column"])
+    if spec["shape"] == "long":
+        return pd.DataFrame({
+            "Year": shares.index.get_level_values(0),
+            spec["label"]: shares.index.get_level_values(1),
+            spec["value"]: shares.values,
+        })
+    wide = shares.unstack(fill_value=0)
+    wide.columns = [str(c) for c in wide.columns]
+    return wide.rename_axis(index="Year").reset_index()
+
+
+def table_names(columns):
+    """Dataset names whose tables depend on any of the raw survey `columns`."""
+    if RESPONDENTS in columns and load_margins() is not None:
+        # New respondents change the weights, and with them every table
+        return {"gender_age", *TABLES}
+    names = {name for name, spec in TABLES.items() if spec["column"] in columns}
+    if set(DEMOGRAPHIC_COLUMNS) & set(columns):
+        names.add("gender_age")
+    return names
+
+
+def count_survey(path, memory_budget=256 * 2**20):
+    counts = SurveyCounts()
+    for chunk in iter_chunks(path, memory_budget=memory_budget):
+        counts.add(chunk)
+    return counts
+
+
+def load_survey(path, memory_budget=256 * 2**20):
+    """Aggregate the raw survey at `path` into dashboard tables by dataset name."""
+    return count_survey(path, memory_budget).tables()
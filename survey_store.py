@@ -0,0 +1,167 @@
+"""Columnar survey store on Parquet/Arrow.
+
+Responses are written as a hive-partitioned Parquet dataset (year=/village=)
+with every categorical column dictionary-encoded. Reads go through a
+memory-mapped filesystem, so Dash worker processes share the OS page cache
+instead of each holding a private pandas copy. Year/village filters prune
+whole partitions and other filters are pushed down to row-group statistics.
+
+    python survey_store.py ingest STORE_DIR raw1.csv raw2.parquet ...
+"""
+import argparse
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs
+
+from survey_loader import RESPONDENTS, YEAR, SurveyCounts, index_names, iter_chunks, survey_columns
+from weighting import RAKE_COLUMNS
+
+VILLAGE = "village"
+PARTITION_COLUMNS = [YEAR, VILLAGE]
+ROWS_PER_GROUP = 64 * 1024
+# Rows grouped per pass when counting; bounds memory to a few bytes per cell
+SCAN_ROWS = 2**20
+
+
+class SurveyStore:
+    def __init__(self, root):
+        self.root = root
+        self.filesystem = pyarrow.fs.LocalFileSystem(use_mmap=True)
+
+    def append(self, frame):
+        """Write one batch of responses as new files in the matching partitions."""
+        frame = frame.copy()
+        for column in frame.columns:
+            if column not in PARTITION_COLUMNS and frame[column].dtype == object:
+                frame[column] = frame[column].astype("category")
+        if VILLAGE not in frame:
+            frame[VILLAGE] = "unknown"
+        frame[YEAR] = frame[YEAR].astype(str)
+        frame[VILLAGE] = frame[VILLAGE].astype(str)
+        ds.write_dataset(
+            pa.Table.from_pandas(frame, preserve_index=False),
+            self.root,
+            format="parquet",
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor="hive",
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            max_rows_per_group=ROWS_PER_GROUP,
+            min_rows_per_group=min(ROWS_PER_GROUP, len(frame)),
+            filesystem=self.filesystem,
+        )
+
+    def ingest(self, path, memory_budget=256 * 2**20):
+        columns = [VILLAGE, *survey_columns()]
+        for chunk in iter_chunks(path, columns=columns, memory_budget=memory_budget):
+            self.append(chunk)
+
+    def dataset(self):
+        return ds.dataset(
+            self.root,
+            format="parquet",
+            partitioning=ds.HivePartitioning.discover(infer_dictionary=True),
+            filesystem=self.filesystem,
+        )
+
+    def scan(self, columns=None, batch_size=ROWS_PER_GROUP, **filters):
+        """Yield pandas chunks of the rows matching `filters`, e.g. year="2024"."""
+        dataset = self.dataset()
+        if columns is not None:
+            columns = [c for c in columns if c in dataset.schema.names]
+        scanner = dataset.scanner(columns=columns, filter=filter_expression(filters), batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def read(self, columns=None, **filters):
+        return pd.concat(list(self.scan(columns, **filters)), ignore_index=True)
+
+    def counts(self, progress=None, **filters):
+        """SurveyCounts of the matching rows, grouped inside Arrow on dictionary codes.
+
+        `progress(fraction, message)` is called after each group of rows.
+        """
+        dataset = self.dataset()
+        columns = [c for c in survey_columns() if c in dataset.schema.names]
+        counted = [c for c in columns if c != YEAR]
+        counts = SurveyCounts()
+        total = dataset.count_rows(filter=filter_expression(filters)) if progress else 0
+        done = 0
+        for table in self._tables(dataset, columns, filters):
+            counts.add_counts(RESPONDENTS, grouped_counts(table))
+            for column in counted:
+                counts.add_counts(column, grouped_counts(table, column))
+            done += table.num_rows
+            if progress:
+                progress(done / total, f"{done:,} of {total:,} responses")
+        return counts
+
+    def _tables(self, dataset, columns, filters, rows=SCAN_ROWS):
+        # Coalesce scanned batches so Arrow groups ~SCAN_ROWS rows at a time
+        batches, pending = [], 0
+        for batch in dataset.scanner(columns=columns, filter=filter_expression(filters)).to_batches():
+            batches.append(batch)
+            pending += batch.num_rows
+            if pending >= rows:
+                yield pa.Table.from_batches(batches).unify_dictionaries()
+                batches, pending = [], 0
+        if pending:
+            yield pa.Table.from_batches(batches).unify_dictionaries()
+
+    def values(self, column):
+        """Distinct values of a column, read from partition names where possible."""
+        dataset = self.dataset()
+        if column in PARTITION_COLUMNS:
+            values = set()
+            for fragment in dataset.get_fragments():
+                expression = ds.get_partition_keys(fragment.partition_expression)
+                if column in expression:
+                    values.add(str(expression[column]))
+            return sorted(values)
+        table = dataset.to_table(columns=[column])
+        return sorted(str(v) for v in pc.unique(table[column].combine_chunks()).to_pylist() if v is not None)
+
+
+def grouped_counts(table, column=None):
+    """(year, *raking cells[, column]) counts of an Arrow table, grouped on dictionary codes."""
+    cells = [c for c in RAKE_COLUMNS if c in table.column_names]
+    keys = list(dict.fromkeys([YEAR, *cells, *([column] if column else [])]))
+    grouped = table.group_by(keys).aggregate([([], "count_all")]).to_pandas()
+    grouped = grouped.dropna(subset=[YEAR, column] if column else [YEAR])
+    levels = [grouped[YEAR].astype(str)]
+    for cell in RAKE_COLUMNS:
+        # A missing answer (or column) is a raking cell of its own, ""
+        levels.append(grouped[cell].astype(object).fillna("").astype(str) if cell in cells
+                      else pd.Series("", index=grouped.index))
+    if column:
+        levels.append(grouped[column].astype(str))
+    index = pd.MultiIndex.from_arrays(levels, names=index_names(column or RESPONDENTS))
+    return pd.Series(grouped["count_all"].to_numpy(), index=index)
+
+
+def filter_expression(filters):
+    expression = None
+    for column, value in filters.items():
+        if value is None:
+            continue
+        values = [str(v) for v in value] if isinstance(value, (list, tuple, set)) else [str(value)]
+        term = ds.field(column).isin(values)
+        expression = term if expression is None else expression & term
+    return expression
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the columnar survey store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="append raw survey files to the store")
+    ingest.add_argument("store")
+    ingest.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+    store = SurveyStore(args.store)
+    for path in args.paths:
+        store.ingest(path)
@@ -0,0 +1,29 @@
+"""Synthetic survey microdata shared by the tests."""
+import numpy as np
+import pandas as pd
+import pytest
+
+# Raw survey columns (see survey_loader.TABLES) and the answers drawn for each
+ANSWERS = {
+    "year": ["2021", "2024"],
+    "gender": ["Female", "Male"],
+    "age_band": ["18-29", "30-45", "46-60", "60+"],
+    "water_availability": ["Shortages", "Improved"],
+    "irrigation": ["Improved", "No Change", "Others"],
+    "crop": ["Mixed Cropping", "Cotton"],
+    "income_level": ["Low", "Moderate", "Significant"],
+    "wellbeing": ["Poor", "Better", "Much Better"],
+    "suggestion": ["Training", "Credit", "Water Storage", "Markets"],
+}
+
+
+@pytest.fixture
+def survey():
+    """survey(n, seed) -> n respondents' answers, with about 5% of each question unanswered."""
+    def make(n, seed=0):
+        rng = np.random.default_rng(seed)
+        frame = pd.DataFrame({column: rng.choice(answers, n) for column, answers in ANSWERS.items()})
+        for column in list(ANSWERS)[1:]:
+            frame.loc[rng.random(n) < 0.05, column] = None
+        return frame
+    return make
@@ -0,0 +1,84 @@
+"""Cube cross-tabs equal pandas.crosstab over the same microdata.
+
+    python -m pytest tests/
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import weighting  # noqa: E402
+from cube import VILLAGE, build_cube  # noqa: E402
+from weighting import RAKE_COLUMNS, rake  # noqa: E402
+
+MARGINS = {"gender": {"Female": 0.51, "Male": 0.49},
+           "age_band": {"18-29": 0.31, "30-45": 0.29, "46-60": 0.24, "60+": 0.16}}
+
+CASES = [
+    ("wellbeing", "age_band", {}),
+    ("income_level", "year", {"gender": "Female"}),
+    ("suggestion", VILLAGE, {"year": ["2024"], "age_band": ["18-29", "60+"]}),
+    # Unknown labels select nothing rather than failing
+    ("crop", "gender", {VILLAGE: ["Village 1", "Village 3", "Nowhere"]}),
+    ("irrigation", None, {"year": "2021"}),
+]
+
+
+@pytest.fixture
+def microdata(survey):
+    frame = survey(3000)
+    # The survey store's village column; survey_loader's tables do not use it
+    frame[VILLAGE] = np.random.default_rng(1).choice([f"Village {i}" for i in range(1, 6)], len(frame))
+    return frame
+
+
+def expected_crosstab(frame, question, by, filters, weights=None):
+    # The cube counts a missing gender or age band as a raking cell of its own, ""
+    frame = frame.assign(**{column: frame[column].fillna("") for column in RAKE_COLUMNS})
+    for dim, values in filters.items():
+        frame = frame[frame[dim].isin([values] if isinstance(values, str) else values)]
+    values = None if weights is None else weights[frame.index]
+    aggfunc = None if weights is None else "sum"
+    if by is None:
+        return pd.crosstab(pd.Series("", index=frame.index), frame[question], values=values, aggfunc=aggfunc).iloc[0]
+    return pd.crosstab(frame[by], frame[question], values=values, aggfunc=aggfunc)
+
+
+def assert_matches(actual, expected):
+    if isinstance(actual, pd.Series):
+        assert set(expected.index) <= set(actual.index)
+        expected = expected.reindex(actual.index, fill_value=0)
+    else:
+        assert set(expected.index) <= set(actual.index) and set(expected.columns) <= set(actual.columns)
+        expected = expected.reindex(index=actual.index, columns=actual.columns).fillna(0)
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-9)
+
+
+@pytest.mark.parametrize("question, by, filters", CASES)
+def test_unweighted_crosstab_matches_pandas(microdata, question, by, filters):
+    # Built from two chunks, so labels first seen in the second one are merged in
+    cube = build_cube([microdata.iloc[:1000], microdata.iloc[1000:]])
+    assert_matches(cube.crosstab(question, by, filters, weighted=False),
+                   expected_crosstab(microdata, question, by, filters))
+
+
+@pytest.mark.parametrize("question, by, filters", CASES)
+def test_weighted_crosstab_matches_pandas(microdata, question, by, filters, tmp_path, monkeypatch):
+    path = tmp_path / "margins.json"
+    path.write_text(json.dumps(MARGINS))
+    monkeypatch.setattr(weighting, "MARGINS_PATH", str(path))
+    # Each respondent's raking weight, fitted on (year, gender, age band) counts of all the rows
+    cells = microdata.assign(**{column: microdata[column].fillna("") for column in RAKE_COLUMNS})
+    cells = cells.groupby(["year", *RAKE_COLUMNS]).size()
+    weights = rake(cells, MARGINS)
+    rows = pd.MultiIndex.from_frame(microdata[["year", *RAKE_COLUMNS]].fillna(""))
+    weights = pd.Series(weights.reindex(rows).to_numpy(), index=microdata.index)
+
+    cube = build_cube([microdata])
+    assert_matches(cube.crosstab(question, by, filters), expected_crosstab(microdata, question, by, filters, weights))
@@ -0,0 +1,89 @@
+"""Registry figures look like the baseline app5.4's hand-styled figures.
+
+The baseline built every chart with px and then update_layout/update_traces.
+Its settings are recorded here, and each registry figure must resolve to the
+same ones, whether they come from the figure itself or the alkod template.
+Error bars (bootstrap.py) and trace colors are not part of the comparison.
+
+    python -m pytest tests/
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from figure_registry import FIGURE_SPECS, FigureRegistry  # noqa: E402
+
+TEXT_COLOR = "rgba(0,0,0,0.7)"
+BORDER_COLOR = "rgba(0,0,0,0.1)"
+MARGIN = {"l": 30, "r": 30, "t": 40, "b": 30}
+PIE_MARGIN = {"l": 20, "r": 20, "t": 40, "b": 20}
+MARKER_LINE = {"color": BORDER_COLOR, "width": 1}
+LINE = {"color": BORDER_COLOR, "width": 2}
+
+# name -> (title, x axis title, y axis title, legend title, margin, trace style)
+BASELINE = {
+    'demographics': ("Demographics Overview", None, None, "Categories", dict(PIE_MARGIN, pad=10), MARKER_LINE),
+    'water_availability': ("Water Availability Changes", "Category", "Respondents", "Year", MARGIN, MARKER_LINE),
+    'agri_water': ("Agricultural Water Availability", "Year", "Percentage", "Condition", MARGIN, LINE),
+    'irrigation': ("Change in Irrigation Practices", "Practice", "Percentage", None, MARGIN, MARKER_LINE),
+    'crop_types': ("Crop Types (2021 vs. 2024)", "Crop", "Percentage", "Year", MARGIN, MARKER_LINE),
+    'yield_changes': ("Yield Changes", "Percentage", "Category", None, MARGIN, MARKER_LINE),
+    'income': ("Income Changes Over Time", "Year", "Percentage", "Income Level", MARGIN, LINE),
+    'economic': ("Economic Activities", None, None, "Economic Activities", PIE_MARGIN, MARKER_LINE),
+    'employment': ("Employment Opportunities", "Activity", "Percentage", None, MARGIN, MARKER_LINE),
+    'wellbeing': ("Well-being Ratings", "Year", "Percentage", "Rating", MARGIN, MARKER_LINE),
+    'community': ("Community Benefits", "Percentage", "Improvement", None, MARGIN, MARKER_LINE),
+    'benefits': ("Significant Benefits", None, None, "Benefits", PIE_MARGIN, MARKER_LINE),
+    'suggestions': ("Suggestions Distribution", "Suggestion", "Frequency", None, MARGIN, MARKER_LINE),
+}
+
+
+def merged(base, override):
+    result = dict(base)
+    for key, value in override.items():
+        result[key] = merged(result.get(key, {}), value) if isinstance(value, dict) else value
+    return result
+
+
+def resolve(fig):
+    """The figure's layout and first trace with the template's settings filled in."""
+    fig = fig.to_plotly_json()
+    template = fig["layout"].get("template", {})
+    layout = merged(template.get("layout", {}), fig["layout"])
+    trace = fig["data"][0]
+    trace = merged((template.get("data", {}).get(trace["type"]) or [{}])[0], trace)
+    return layout, trace
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return FigureRegistry()
+
+
+def test_every_chart_has_a_baseline():
+    assert set(BASELINE) == set(FIGURE_SPECS)
+
+
+@pytest.mark.parametrize("name", sorted(BASELINE))
+def test_registry_figure_matches_baseline(registry, name):
+    title, xaxis_title, yaxis_title, legend_title, margin, style = BASELINE[name]
+    layout, trace = resolve(registry[name])
+    assert layout["title"]["text"] == title
+    assert layout["height"] == 300
+    assert layout["margin"] == margin
+    assert layout["showlegend"] is True
+    assert layout["paper_bgcolor"] == layout["plot_bgcolor"] == "white"
+    assert layout["title"]["font"] == {"size": 18, "color": TEXT_COLOR}
+    assert layout["font"] == {"size": 14, "color": TEXT_COLOR}
+    if xaxis_title is not None:
+        assert layout["xaxis"]["title"]["text"] == xaxis_title
+        assert layout["yaxis"]["title"]["text"] == yaxis_title
+    if legend_title is not None:
+        assert layout["legend"]["title"]["text"] == legend_title
+    # px sets other line keys (dash) itself; only the ones the baseline styled are compared
+    line = trace["line"] if style is LINE else trace["marker"]["line"]
+    assert {key: line.get(key) for key in style} == style
@@ -0,0 +1,68 @@
+"""serve.py serves the same responses as the dev app, after its pre-fork warm-up.
+
+Each side runs in a fresh interpreter, so the warm-up's caches cannot leak
+into the dev app's responses.
+
+    python -m pytest tests/
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+from dash_requests import callback_requests  # noqa: E402
+
+# Dash puts a token drawn at startup in the page config; it differs between any two processes
+END_ID = re.compile(r'"end_id":"[^"]*"')
+
+
+def responses(entry_point, warm):
+    """Status and body of "/", "/_dash-layout" and the first callback request, as the test client sees them."""
+    sys.path.insert(0, ROOT)
+    from entry_points import load_entry_point
+
+    module = load_entry_point(entry_point)
+    if warm:
+        import serve
+
+        serve.warm(module)
+    client = module.app.server.test_client()
+    results = {}
+    for path in ("/", "/_dash-layout"):
+        response = client.get(path)
+        results[path] = [response.status_code, END_ID.sub('"end_id":""', response.get_data(as_text=True))]
+    callbacks = callback_requests(client.get("/_dash-dependencies").get_json())
+    if callbacks:
+        label, body = callbacks[0]
+        response = client.post("/_dash-update-component", json=body)
+        results[f"callback {label}"] = [response.status_code, response.get_data(as_text=True)]
+    return results
+
+
+def run(entry_point, warm, tmp_path):
+    # Nothing shared between the two runs: no shared cache, job queue or data watcher
+    env = dict(os.environ, ALKOD_SHARED_CACHE="", ALKOD_RELOAD_INTERVAL="0",
+               ALKOD_JOB_DB=str(tmp_path / f"jobs-{warm}.sqlite"))
+    output = subprocess.run([sys.executable, __file__, entry_point, "warm" if warm else "dev"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize("entry_point", ["main_version1", "main_version2", "app5.4"])
+def test_warmed_server_matches_dev_app(entry_point, tmp_path):
+    dev = run(entry_point, False, tmp_path)
+    production = run(entry_point, True, tmp_path)
+    assert set(production) == set(dev)
+    for request, (status, body) in dev.items():
+        assert status == 200, request
+        assert production[request] == [status, body], request
+
+
+if __name__ == "__main__":
+    print(json.dumps(responses(sys.argv[1], sys.argv[2] == "warm")))
@@ -0,0 +1,63 @@
+"""Raking weights reproduce the census margins.
+
+    python -m pytest tests/
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from survey_loader import RESPONDENTS, SurveyCounts  # noqa: E402
+from weighting import RAKE_COLUMNS, cell_weights, rake  # noqa: E402
+
+MARGINS = {"gender": {"Female": 0.51, "Male": 0.49},
+           "age_band": {"18-29": 0.31, "30-45": 0.29, "46-60": 0.24, "60+": 0.16}}
+
+
+@pytest.fixture
+def respondents(survey):
+    # Skewed towards women and older respondents, so the weights have work to do
+    frame = survey(5000)
+    frame.loc[frame.index[:1500], ["gender", "age_band"]] = ["Female", "60+"]
+    return SurveyCounts().add(frame).counts[RESPONDENTS]
+
+
+def weighted_margins(respondents, weights, column):
+    """(year, category) weighted respondents of one raking column, and the unweighted ones."""
+    level = 1 + RAKE_COLUMNS.index(column)
+    weighted = (respondents * weights).groupby(level=[0, level]).sum()
+    return weighted, respondents.groupby(level=[0, level]).sum()
+
+
+@pytest.mark.filterwarnings("error")
+def test_weighted_margins_converge_to_census(respondents):
+    weights = cell_weights(respondents, MARGINS)
+    for column, shares in MARGINS.items():
+        weighted, observed = weighted_margins(respondents, weights, column)
+        for year in weighted.index.levels[0]:
+            # Missing answers (cell "") are not in the margins and keep their count
+            assert weighted[year].get("", 0) == pytest.approx(observed[year].get("", 0))
+            listed = weighted[year].drop("", errors="ignore")
+            np.testing.assert_allclose(listed / listed.sum(), [shares[c] for c in listed.index], atol=1e-6)
+        # Every year keeps its number of respondents
+        np.testing.assert_allclose(weighted.groupby(level=0).sum(), observed.groupby(level=0).sum())
+
+
+@pytest.mark.filterwarnings("error")
+def test_category_missing_from_margins_keeps_its_sample_share(respondents):
+    margins = {"gender": MARGINS["gender"], "age_band": {"18-29": 0.4, "30-45": 0.35, "46-60": 0.25}}
+    weights = rake(respondents, margins)
+    assert np.isfinite(weights).all() and (weights > 0).all()
+    weighted, observed = weighted_margins(respondents, weights, "age_band")
+    for year in weighted.index.levels[0]:
+        assert weighted[year]["60+"] == pytest.approx(observed[year]["60+"])
+        listed = weighted[year].drop(["60+", ""], errors="ignore")
+        np.testing.assert_allclose(listed / listed.sum(), [margins["age_band"][c] for c in listed.index], atol=1e-6)
+    weighted, _ = weighted_margins(respondents, weights, "gender")
+    for year in weighted.index.levels[0]:
+        listed = weighted[year].drop("", errors="ignore")
+        np.testing.assert_allclose(listed / listed.sum(), [0.51, 0.49], atol=1e-6)
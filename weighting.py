@@ -0,0 +1,118 @@
+"""Survey weights by raking (iterative proportional fitting) to census margins.
+
+The sample's gender and age mix is not the population's (see data_gender_age),
+so unweighted shares over-represent some respondents. ALKOD_MARGINS points at a
+JSON file of population shares per raking column:
+
+    {"gender": {"Female": 0.51, "Male": 0.49},
+     "age_band": {"18-29": 0.31, "30-45": 0.29, "46-60": 0.24, "60+": 0.16}}
+
+A raking weight only depends on a respondent's year and (gender, age band)
+cell. Fitting therefore runs on the dense year x gender x age_band table of
+respondent counts rather than on rows: each IPF step rescales the whole table
+with one broadcast multiplication, for every year at once. Each year is raked
+to the same shares and keeps its number of respondents. Categories a margin
+does not list, and missing answers, keep their sample share.
+
+Weights are cached by a hash of the cell counts and the margins, so they are
+refitted only when the microdata or the margins change.
+"""
+import functools
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from result_cache import LRUCache
+
+RAKE_COLUMNS = ("gender", "age_band")
+MARGINS_PATH = os.environ.get("ALKOD_MARGINS")
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 200
+
+weight_cache = LRUCache(max_bytes=4 * 2**20)
+
+
+def load_margins(path=None):
+    """Population shares per raking column from ALKOD_MARGINS, or None when unset."""
+    path = path or MARGINS_PATH
+    if not path:
+        return None
+    return read_margins(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def read_margins(path, _mtime_ns):
+    with open(path) as f:
+        margins = json.load(f)
+    unknown = set(margins) - set(RAKE_COLUMNS)
+    if unknown:
+        raise ValueError(f"{path}: margins for {sorted(unknown)}; only {list(RAKE_COLUMNS)} can be raked")
+    return {column: {str(category): float(share) for category, share in shares.items()}
+            for column, shares in margins.items()}
+
+
+def margins_version(margins):
+    return hashlib.sha1(json.dumps(margins, sort_keys=True).encode()).hexdigest() if margins else ""
+
+
+def cell_weights(respondents, margins):
+    """Raking weight per cell of `respondents`, a count Series indexed by (year, *RAKE_COLUMNS)."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(respondents, index=True).values.tobytes())
+    digest.update(margins_version(margins).encode())
+    return weight_cache.get_or_compute(digest.hexdigest(), lambda: rake(respondents, margins),
+                                       lambda weights: int(weights.memory_usage(deep=True)))
+
+
+def rake(respondents, margins, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    index = respondents.index.remove_unused_levels()
+    shape = tuple(len(level) for level in index.levels)
+    cells = tuple(np.asarray(codes) for codes in index.codes)
+    observed = np.zeros(shape)
+    np.add.at(observed, cells, respondents.to_numpy(dtype=float))
+
+    # Weighted respondents per (year, category) of each raked axis. Fixed from the
+    # observed counts, so unlisted categories stay put while the other axes are fitted
+    targets = []
+    for axis, column in enumerate(RAKE_COLUMNS, start=1):
+        if column in margins:
+            # Population share per category; NaN where the margin is silent
+            shares = np.array([margins[column].get(str(category), np.nan) for category in index.levels[axis]])
+            others = tuple(i for i in range(1, observed.ndim) if i != axis)
+            targets.append((axis, others, target_margin(observed.sum(axis=others), shares)))
+
+    fitted = observed.copy()
+    for _ in range(max_iterations):
+        worst = 0.0
+        for axis, others, target in targets:
+            margin = fitted.sum(axis=others)
+            factor = np.divide(target, margin, out=np.ones_like(margin), where=margin > 0)
+            fitted *= np.expand_dims(factor, others)
+            worst = max(worst, float(np.abs(factor - 1).max(initial=0)))
+        if worst < tolerance:
+            break
+    else:
+        warnings.warn(f"Raking did not converge within {max_iterations} iterations; "
+                      f"check that the margins can be met by the sample")
+    weights = np.divide(fitted, observed, out=np.ones_like(fitted), where=observed > 0)
+    return pd.Series(weights[cells], index=respondents.index)
+
+
+def target_margin(margin, shares):
+    # Listed categories present in a year share that year's listed total in the
+    # census proportions; unlisted ones keep their total
+    listed = ~np.isnan(shares)
+    present = np.where(listed & (margin > 0), np.nan_to_num(shares), 0.0)
+    total = (margin * listed).sum(axis=1, keepdims=True)
+    scale = np.divide(total, present.sum(axis=1, keepdims=True), out=np.zeros_like(total),
+                      where=present.sum(axis=1, keepdims=True) > 0)
+    return np.where(listed, present * scale, margin)
+
+
+def effective_size(counts, weights):
+    """Kish's effective sample size per year of (year, ...)-indexed `counts` under `weights`."""
+    weighted = counts * weights
+    return weighted.groupby(level=0).sum() ** 2 / (weighted * weights).groupby(level=0).sum()